@@ -1,36 +1,68 @@
+import time
+RUN_T0 = time.perf_counter()  # เริ่มจับเวลา rerun นี้ (ดูรายงานเวลาเริ่มระบบท้ายไฟล์)
 import streamlit as st
-import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
+import importlib
 import json
-import requests
 import base64
-import time
-import io
 import re
 import os
-import textwrap
+import sys
 import pytz
-
-# --- ส่วนของ PDF Library ---
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from diagnostics import Diagnostics
 
 # ✅ 1. ตั้งค่าพื้นฐาน
 thai_tz = pytz.timezone('Asia/Bangkok')
-FONT_FILE = "THSarabunNew.ttf" 
-FONT_BOLD = "THSarabunNew.ttf" 
 
-# --- 2. ดึงข้อมูลจาก Secrets ---
-SHEET_NAME = st.secrets["SHEET_NAME"]
-DRIVE_FOLDER_ID = st.secrets["DRIVE_FOLDER_ID"]
-GAS_APP_URL = st.secrets["GAS_APP_URL"]
-UPGRADE_PASSWORD = st.secrets["UPGRADE_PASSWORD"] 
-OFFICER_ACCOUNTS = st.secrets["OFFICER_ACCOUNTS"]
+# ✅ 1.1 โมดูลหนัก (pandas / gspread / reportlab) import เมื่อใช้ครั้งแรกผ่าน lazy() เท่านั้น
+# หน้าลงทะเบียนจึงเปิดได้โดยไม่ต้องโหลดของที่ใช้เฉพาะเจ้าหน้าที่ ; เวลาที่ใช้ import ถูกเก็บใน boot_stats()
+@st.cache_resource(show_spinner=False)
+def boot_stats():
+    return {"started": time.time(), "first_run": None, "imports": {}}
+
+def lazy(name):
+    mod = sys.modules.get(name)
+    if mod is None:
+        t = time.perf_counter(); mod = importlib.import_module(name)
+        boot_stats()["imports"][name] = time.perf_counter() - t
+    return mod
+
+# ✅ 1.2 วัดผลราย rerun / session: เวลา, จำนวนครั้ง, ไบต์ ของงานภายนอก (ดูในเมนู Diagnostics ของ Super Admin)
+@st.cache_resource(show_spinner=False)
+def get_diagnostics():
+    return Diagnostics()
+
+diag = get_diagnostics()
+_ctx = get_script_run_ctx()
+diag.begin(_ctx.session_id if _ctx else "")
+
+# --- 2. ดึงข้อมูลจาก Secrets (อ่านครั้งเดียวต่อ process) ---
+@st.cache_resource(show_spinner=False)
+def load_settings():
+    s = st.secrets
+    return {
+        "SHEET_NAME": s["SHEET_NAME"],
+        "DRIVE_FOLDER_ID": s["DRIVE_FOLDER_ID"],
+        "GAS_APP_URL": s["GAS_APP_URL"],
+        "UPGRADE_PASSWORD": s["UPGRADE_PASSWORD"],
+        "OFFICER_ACCOUNTS": s["OFFICER_ACCOUNTS"],
+        "ROSTER_TTL": int(s.get("ROSTER_TTL", 60)),  # วินาทีที่ใช้ข้อมูลชีตใน cache ก่อนโหลดใหม่
+        "PHOTO_MAX_PX": int(s.get("PHOTO_MAX_PX", 1600)),  # ย่อรูปด้านยาวไม่เกินกี่พิกเซลก่อนอัปโหลด
+        "PHOTO_QUALITY": int(s.get("PHOTO_QUALITY", 80)),  # คุณภาพ JPEG หลังย่อ
+        "WRITE_FLUSH_SEC": float(s.get("WRITE_FLUSH_SEC", 5)),  # เขียนแต้ม/การแก้ไขที่ค้างลงชีตทุกกี่วินาที
+        "WRITE_FLUSH_OPS": int(s.get("WRITE_FLUSH_OPS", 20)),  # หรือเมื่อค้างครบกี่รายการ
+        "THUMB_MEM_MB": int(s.get("THUMB_MEM_MB", 64)),  # cache รูปในหน่วยความจำ (MB)
+        "THUMB_DISK_MB": int(s.get("THUMB_DISK_MB", 512)),  # cache รูปบนดิสก์ (MB)
+        "SHEETS_QUOTA_PER_MIN": int(s.get("SHEETS_QUOTA_PER_MIN", 60)),  # quota request ต่อนาทีของ Sheets API (ใช้เทียบในหน้า Diagnostics)
+    }
+
+cfg = load_settings()
+SHEET_NAME, DRIVE_FOLDER_ID, GAS_APP_URL = cfg["SHEET_NAME"], cfg["DRIVE_FOLDER_ID"], cfg["GAS_APP_URL"]
+UPGRADE_PASSWORD, OFFICER_ACCOUNTS = cfg["UPGRADE_PASSWORD"], cfg["OFFICER_ACCOUNTS"]
+ROSTER_TTL, PHOTO_MAX_PX, PHOTO_QUALITY = cfg["ROSTER_TTL"], cfg["PHOTO_MAX_PX"], cfg["PHOTO_QUALITY"]
+WRITE_FLUSH_SEC, WRITE_FLUSH_OPS = cfg["WRITE_FLUSH_SEC"], cfg["WRITE_FLUSH_OPS"]
+THUMB_MEM_MB, THUMB_DISK_MB, SHEETS_QUOTA_PER_MIN = cfg["THUMB_MEM_MB"], cfg["THUMB_DISK_MB"], cfg["SHEETS_QUOTA_PER_MIN"]
 
 # --- 3. Setup หน้าเว็บ ---
 st.set_page_config(page_title=f"ระบบจราจรโรงเรียนจันทรุเบกษาอนุสรณ์", page_icon="🏍️", layout="wide")
@@ -40,7 +72,6 @@ if 'page' not in st.session_state: st.session_state['page'] = 'student'
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
 if 'officer_name' not in st.session_state: st.session_state['officer_name'] = ""
 if 'officer_role' not in st.session_state: st.session_state['officer_role'] = ""
-if 'df_tra' not in st.session_state: st.session_state['df_tra'] = None
 if 'traffic_page' not in st.session_state: st.session_state['traffic_page'] = 'main'
 if 'edit_data' not in st.session_state: st.session_state['edit_data'] = None
 
@@ -49,39 +80,102 @@ def go_to_page(page_name):
     st.session_state['page'] = page_name
     st.rerun()
 
+# Pool เดียวต่อ server process (ใช้ร่วมกันทุก session/rerun)
+@st.cache_resource(show_spinner=False)
+def get_sheet_pool():
+    raw_json = st.secrets["textkey"]["json_content"].strip()
+    clean_json = re.sub(r'^[\'"]|[\'"]$', '', raw_json)
+    key_dict = json.loads(clean_json, strict=False)
+    pool = lazy("sheet_pool").SheetPool(key_dict, SHEET_NAME)
+    pool.on_call, pool.on_response = diag.sheets_call, diag.response_hook("sheets")
+    return pool
+
 def connect_gsheet():
-    try:
-        raw_json = st.secrets["textkey"]["json_content"].strip()
-        clean_json = re.sub(r'^[\'"]|[\'"]$', '', raw_json)
-        key_dict = json.loads(clean_json, strict=False)
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
-        return gspread.authorize(creds).open(SHEET_NAME).sheet1
+    try: pool = get_sheet_pool()
     except Exception as e:
         st.error(f"❌ JSON Error: ตรวจสอบการวางค่าใน Secrets"); st.stop()
-
-def upload_to_drive(file_obj, filename):
-    if not file_obj: return None
     try:
-        base64_str = base64.b64encode(file_obj.getvalue()).decode('utf-8')
-        payload = {"folder_id": DRIVE_FOLDER_ID, "filename": filename, "file": base64_str, "mimeType": "image/jpeg"}
-        res = requests.post(GAS_APP_URL, json=payload, timeout=20)
-        return res.json().get("link") if res.json().get("status") == "success" else None
-    except: return None
+        with diag.span("connect_gsheet"): pool.worksheet()
+        return pool.sheet
+    except Exception as e:
+        st.error(f"❌ เชื่อมต่อ Google Sheets ไม่ได้: {e}"); st.stop()
+
+# Roster กลาง ใช้ร่วมกันทุก session (โหลดชีตใหม่ตาม ROSTER_TTL)
+@st.cache_resource(show_spinner=False)
+def get_roster():
+    return lazy("roster").RosterStore(get_sheet_pool().sheet, ttl=ROSTER_TTL)
+
+# ประวัติแต้มแบบ event (ชีต score_events)
+@st.cache_resource(show_spinner=False)
+def get_event_log():
+    return lazy("score_events").EventLog(get_sheet_pool(), ttl=ROSTER_TTL)
+
+# คิวเขียนกลาง: หัก/เพิ่มแต้ม และการแก้ไข รวมเป็น batch_update ครั้งเดียว
+@st.cache_resource(show_spinner=False)
+def get_write_queue():
+    return lazy("write_queue").WriteQueue(get_sheet_pool().sheet, get_roster(), get_event_log(), WRITE_FLUSH_SEC, WRITE_FLUSH_OPS)
+
+# ประวัติสำหรับ PDF = ข้อความเก่าในคอลัมน์ M (ที่ยังไม่ migrate) + รายการจาก score_events
+def history_of(v):
+    legacy = str(v[12]).strip("\n") if str(v[12]).lower() != "nan" else ""
+    return "\n".join(x for x in (legacy, lazy("score_events").format_history(get_event_log().for_student(v[2]))) if x)
+
+def with_history(v):
+    return v[:12] + [history_of(v)] + v[13:]
+
+# Search index สร้างใหม่เฉพาะเมื่อ ชื่อ/รหัส/ทะเบียน ใน roster เปลี่ยน
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_search_index(_roster, index_version):
+    with diag.span("search_index_build"): return lazy("search_index").SearchIndex(_roster.rows())
+
+# อัปโหลดหลายรูปพร้อมกัน: files = {key: (file_obj, filename)} -> {key: link หรือ None}
+def upload_to_drive(files, progress=None):
+    items = {k: (f.getvalue(), fn) for k, (f, fn) in files.items() if f}
+    get_gas_session()
+    with diag.span("upload_to_drive"):
+        return lazy("photo_upload").upload_photos(GAS_APP_URL, DRIVE_FOLDER_ID, items, PHOTO_MAX_PX, PHOTO_QUALITY, progress)
+
+# session เดียวกับที่ photo_upload ใช้ ติด hook นับ request/ไบต์ที่ส่งไป GAS ครั้งเดียวต่อ process
+@st.cache_resource(show_spinner=False)
+def get_gas_session():
+    session = lazy("photo_upload").http_session()
+    session.hooks["response"].append(diag.response_hook("gas"))
+    return session
 
 def get_img_link(url):
-    match = re.search(r'/d/([a-zA-Z0-9_-]+)|id=([a-zA-Z0-9_-]+)', str(url))
-    file_id = match.group(1) or match.group(2) if match else None
+    file_id = lazy("thumb_cache").drive_file_id(url)
     return f"https://drive.google.com/thumbnail?id={file_id}&sz=w800" if file_id else url
 
+# Cache รูปจาก Drive กลางของ process (หน้าค้นหา / บัตร / PDF ใช้ร่วมกัน)
+@st.cache_resource(show_spinner=False)
+def get_thumb_cache():
+    tc = lazy("thumb_cache")
+    return tc.ThumbCache(diag.timed("drive_thumbnail", tc.fetch_drive_thumbnail, bind=False), mem_limit=THUMB_MEM_MB * 1024 * 1024, disk_limit=THUMB_DISK_MB * 1024 * 1024)
+
+# รูปสำหรับ st.image: bytes ถ้ามีใน cache แล้ว ; ยังไม่มี -> ใช้ลิงก์ thumbnail ของ Drive (เบราว์เซอร์โหลดเอง)
+# แล้วโหลดเข้า cache เบื้องหลัง (ไม่บล็อก script) rerun ถัดไปจึงได้ bytes
+def thumb(url, px=480):
+    file_id = lazy("thumb_cache").drive_file_id(url)
+    if not file_id: return url
+    tc = get_thumb_cache(); data = tc.peek(file_id, px)
+    if data is None: tc.warm([file_id], px)
+    return data or get_img_link(url)
+
+# รูปสำหรับฝังใน HTML (<img src=...>)
+def thumb_src(url, px=220):
+    data = thumb(url, px)
+    return f"data:image/jpeg;base64,{base64.b64encode(data).decode()}" if isinstance(data, bytes) else data
+
+# โลโก้อ่านจากดิสก์ครั้งเดียวต่อ process -> (data URI สำหรับ HTML, bytes สำหรับ st.image)
+@st.cache_resource(show_spinner=False)
 def get_base64_logo():
     logo_file = next((f for f in os.listdir('.') if f.lower().startswith('logo')), None)
     if logo_file:
-        with open(logo_file, "rb") as f:
-            return f"data:image/png;base64,{base64.b64encode(f.read()).decode()}", logo_file
+        with open(logo_file, "rb") as f: data = f.read()
+        return f"data:image/png;base64,{base64.b64encode(data).decode()}", data
     return None, None
 
-logo_base64, logo_local_path = get_base64_logo()
+logo_base64, logo_bytes = get_base64_logo()
 
 # --- 🎨 CSS ตกแต่ง (ห้ามแก้ - ชุดเดิมเป๊ะ) ---
 # เพิ่มบรรทัดเหล่านี้เข้าไปในส่วน <style> เดิมครับ
@@ -100,58 +194,88 @@ st.markdown("""
         }
     </style>
 """, unsafe_allow_html=True)
-# ✅ 5. ฟังก์ชันสร้าง PDF
-def create_pdf_tra(vals, img_url1, img_url2, face_url=None, printed_by="N/A"):
-    buffer = io.BytesIO(); c = canvas.Canvas(buffer, pagesize=A4); width, height = A4
-    if os.path.exists(FONT_FILE):
-        pdfmetrics.registerFont(TTFont('Thai', FONT_FILE))
-        pdfmetrics.registerFont(TTFont('ThaiBold', FONT_BOLD if os.path.exists(FONT_BOLD) else FONT_FILE))
-        fn, fb = 'Thai', 'ThaiBold'
-    else: fn, fb = 'Helvetica', 'Helvetica-Bold'
-    
-    c.setFont(fb, 22); c.drawCentredString(width/2, height - 50, f"ทะเบียนประวัติรถ {SHEET_NAME}")
-    c.line(50, height - 85, width - 50, height - 85)
-    c.setFont(fn, 16); c.drawString(60, height - 115, f"ชื่อ: {vals[1]}"); c.drawString(350, height - 115, f"ยี่ห้อ: {vals[4]}")
-    c.drawString(60, height - 135, f"ID: {vals[2]}"); c.drawString(350, height - 135, f"ทะเบียน: {vals[6]}")
-    score = str(vals[13]) if str(vals[13]).isdigit() else "100"
-    c.setFont(fb, 18); c.drawString(60, height - 185, f"คะแนนคงเหลือ: {score} คะแนน")
-    
-    def draw_img(url, x, y, w, h):
-        try:
-            res = requests.get(url, timeout=5); img = ImageReader(io.BytesIO(res.content))
-            c.drawImage(img, x, y, width=w, height=h, preserveAspectRatio=True, mask='auto')
-            c.rect(x, y, w, h, stroke=1, fill=0)
-        except: c.rect(x, y, w, h, stroke=1, fill=0)
-    if face_url: draw_img(face_url, 460, height - 200, 80, 100)
-    draw_img(img_url1, 60, height - 415, 230, 180); draw_img(img_url2, 305, height - 415, 230, 180)
-    
-    c.setFont(fb, 14); c.drawString(60, 350, "📝 ประวัติบันทึกคะแนน:")
-    h_text = str(vals[12]) if str(vals[12]).lower() != "nan" else "ไม่พบประวัติ"
-    to = c.beginText(70, 335); to.setLeading(14)
-    for line in h_text.split('\n'):
-        for wl in textwrap.wrap(line, width=90): to.textLine(wl)
-    c.drawText(to)
-    
-    c.setFont(fn, 10); c.drawRightString(width-50, 30, f"ผู้พิมพ์: {printed_by} | {datetime.now(thai_tz).strftime('%d/%m/%Y %H:%M')}")
-    c.save(); buffer.seek(0); return buffer
+# ✅ 5. PDF: สร้างเมื่อเจ้าหน้าที่กดขอเท่านั้น และ cache ตามข้อมูลแถว (รวมประวัติ) : ข้อมูลเปลี่ยน = สร้างใหม่
+# _printed_by ไม่อยู่ใน key (ขึ้นต้นด้วย _) บัตรจึงแสดงผู้สร้าง + เวลาที่สร้างจริง ใช้ซ้ำได้ทุกคนที่กดภายหลัง
+@st.cache_data(ttl=3600, max_entries=200, show_spinner=False)
+def get_card_pdf(row_vals, _printed_by):
+    v = list(row_vals)
+    with diag.span("pdf_build") as sp:
+        data = lazy("pdf_card").create_pdf_tra(v, get_img_link(v[10]), get_img_link(v[11]), get_img_link(v[14]), _printed_by, title=f"ทะเบียนประวัติรถ {SHEET_NAME}", loader=diag.timed("pdf_image", get_thumb_cache().load)).getvalue()
+        sp.bytes = len(data)
+    return data
+
+# ✅ 5.1 หน้า Diagnostics (Super Admin): rerun ที่ช้าที่สุด, request ต่อนาทีเทียบ quota, อัตรา cache hit
+def diagnostics_panel():
+    boot = boot_stats()
+    st.caption(f"process เริ่ม {datetime.fromtimestamp(boot['started'], thai_tz):%d/%m/%Y %H:%M:%S} | rerun แรก {boot['first_run'] or 0:.2f} วิ")
+
+    per = diag.per_minute(10)
+    st.markdown(f"**Google Sheets request นาทีล่าสุด: {per[-1]} / {SHEETS_QUOTA_PER_MIN}** (สูงสุดใน 10 นาที {max(per)})")
+    st.progress(min(1.0, per[-1] / SHEETS_QUOTA_PER_MIN) if SHEETS_QUOTA_PER_MIN else 0.0)
+    st.bar_chart({"request/นาที": per})
+
+    st.markdown("**rerun ที่ช้าที่สุด (ล่าสุด {} ครั้ง)**".format(len(diag.runs)))
+    st.dataframe([{"เวลา": datetime.fromtimestamp(r.ts, thai_tz).strftime('%H:%M:%S'), "หน้า": r.page or "-", "วินาที": round(r.sec, 3),
+                   "จบด้วย rerun/stop": "✓" if r.interrupted else "", "session": r.session[:8],
+                   "งาน": ", ".join(f"{k}×{n} {r.secs[k]:.2f}s" for k, n in r.calls.most_common() if n)} for r in diag.slowest(10)],
+                 hide_index=True, use_container_width=True)
+
+    st.markdown("**ยอดรวมของ process**")
+    st.dataframe([{"งาน": k, "ครั้ง": n, "รวม (วินาที)": round(sec, 2), "เฉลี่ย (ms)": round(sec / n * 1000, 1) if n else 0, "KB": round(b / 1024, 1)}
+                  for k, (n, sec, b) in diag.totals().items()], hide_index=True, use_container_width=True)
+    st.caption("sheets = คำสั่งผ่าน SheetPool (KB = ทุก HTTP request ไป Google) ; gas = request อัปโหลดรูป ; งานในคิวเขียนเบื้องหลังนับเฉพาะยอดรวมนี้")
+    if diag.methods:
+        st.dataframe([{"คำสั่ง gspread": m, "ครั้ง": n, "error": diag.errors.get(m, 0)} for m, n in diag.methods.most_common()], hide_index=True, use_container_width=True)
+
+    st.markdown("**Cache**")
+    ts = get_thumb_cache().stats(); t_hit = ts["hits"] + ts["disk_hits"]; t_all = t_hit + ts["misses"]
+    n_req, n_pdf = diag.calls["pdf_request"], diag.calls["pdf_build"]
+    roster = get_roster()
+    st.dataframe([
+        {"cache": "รูป thumbnail", "hit rate": f"{t_hit / t_all:.0%}" if t_all else "-", "รายละเอียด": f"mem {ts['hits']} / disk {ts['disk_hits']} / miss {ts['misses']} | {ts['items']} รูป {ts['mem_bytes'] / 1048576:.1f} MB"},
+        {"cache": "PDF รายคน", "hit rate": f"{max(0.0, 1 - n_pdf / n_req):.0%}" if n_req else "-", "รายละเอียด": f"ขอ {n_req} ครั้ง สร้างจริง {n_pdf} ครั้ง"},
+        {"cache": "roster", "hit rate": "-", "รายละเอียด": f"โหลดล่าสุด {time.time() - roster.loaded_at:.0f} วิที่แล้ว (TTL {ROSTER_TTL}) | version {roster.version}"},
+        {"cache": "search index", "hit rate": "-",
+         "รายละเอียด": f"สร้าง {diag.calls['search_index_build']} ครั้ง / ค้นหา {diag.calls['search']} ครั้ง"},
+    ], hide_index=True, use_container_width=True)
+
+    st.markdown("**session ล่าสุด**")
+    st.dataframe([{"session": sid[:8], "rerun": int(c["reruns"]), "รวม (วินาที)": round(c["sec"], 2), "งานภายนอก": int(c["calls"]), "KB": round(c["bytes"] / 1024, 1),
+                   "ล่าสุด": datetime.fromtimestamp(c["last"], thai_tz).strftime('%H:%M:%S')} for sid, c in reversed(diag.session_stats()[-20:])],
+                 hide_index=True, use_container_width=True)
+    if boot["imports"]:
+        st.dataframe([{"โมดูล (lazy import)": k, "วินาที": round(v, 3)} for k, v in boot["imports"].items()], hide_index=True, use_container_width=True)
 
 # ✅ 6. MODULE: TRAFFIC (สรุปผลแบบตัวเลข 4 ช่อง + ทุกฟีเจอร์)
 def traffic_module():
-    sheet = connect_gsheet()
-    if st.session_state.df_tra is None:
-        vals = sheet.get_all_values()
-        if len(vals) > 1: st.session_state.df_tra = pd.DataFrame(vals[1:], columns=[f"C{i}" for i in range(len(vals[0]))])
+    sheet = connect_gsheet(); roster = get_roster(); wq = get_write_queue()
+    with diag.span("roster_df"): df_tra = roster.df()
 
     if st.session_state.traffic_page == 'main':
-        st.markdown(f"### 🚦 ระบบงานจราจร | ผู้ใช้: {st.session_state.officer_name}")
+        c_tt, c_rf = st.columns([8, 2])
+        c_tt.markdown(f"### 🚦 ระบบงานจราจร | ผู้ใช้: {st.session_state.officer_name}")
+        if c_rf.button("🔄 โหลดข้อมูลใหม่", use_container_width=True): roster.refresh(force=True); st.rerun()
+        n_wait = wq.pending()
+        if n_wait:
+            c_w, c_f = st.columns([8, 2])
+            if wq.last_error: c_w.warning(f"⚠️ บันทึกลงชีตไม่สำเร็จ ({wq.last_error}) ระบบจะลองใหม่อัตโนมัติ — ค้าง {n_wait} รายการ")
+            else: c_w.caption(f"⏳ รอบันทึกลงชีต {n_wait} รายการ")
+            if c_f.button("💾 บันทึกทันที", use_container_width=True):
+                try: wq.flush(); st.rerun()
+                except Exception as e: st.error(f"Error: {e}")
+        if wq.conflicts:
+            c_w, c_f = st.columns([8, 2])
+            c_w.error("⚠️ บันทึกไม่ได้ เพราะแถวในชีตถูกลบ/ย้าย หรือรหัสซ้ำ กรุณาแก้ในชีตเอง: " + ", ".join(f"{sid} (แถว {row})" for sid, row, _, _ in wq.conflicts))
+            if c_f.button("รับทราบ", use_container_width=True): wq.drop_conflicts(); st.rerun()
         
         # --- 🚩 จุดที่แก้ไข: สรุปผลแบบตัวเลข 4 ช่อง (ไม่มีกราฟ) ---
-        if st.session_state.df_tra is not None:
-            df = st.session_state.df_tra
-            total = len(df)
-            has_lic = len(df[df['C7'] == "✅ มี"])
-            has_tax = len(df[df['C8'].str.contains("ปกติ|✅", na=False)])
-            has_hel = len(df[df['C9'] == "✅ มี"])
+        if not df_tra.empty:
+            df = df_tra
+            with diag.span("filter"):
+                total = len(df)
+                has_lic = len(df[df['C7'] == "✅ มี"])
+                has_tax = len(df[df['C8'].str.contains("ปกติ|✅", na=False)])
+                has_hel = len(df[df['C9'] == "✅ มี"])
             
             m1, m2, m3, m4 = st.columns(4)
             m1.metric("ลงทะเบียนแล้ว", f"{total} คัน")
@@ -164,63 +288,156 @@ def traffic_module():
         # ค้นหา
         c_in, c_bt = st.columns([4, 1])
         q = c_in.text_input("🔍 ค้นหา (ชื่อ/รหัส/ทะเบียน)", key="tra_search_main")
+        roster.refresh(); s_idx = get_search_index(roster, roster.index_version); rows = roster.rows()
         if c_bt.button("⚡ ค้นหา", use_container_width=True, type="primary") or q:
-            df = st.session_state.df_tra
-            mask = (df['C1'].str.contains(q, case=False) | df['C2'].str.contains(q) | df['C6'].str.contains(q, case=False))
-            res = df[mask]
-            if res.empty: st.warning("ไม่พบข้อมูล")
+            with diag.span("search"): res = s_idx.search(q)
+            if not res: st.warning("ไม่พบข้อมูล")
             else:
-                for i, row in res.iterrows():
-                    v = row.tolist(); sc = int(v[13]) if str(v[13]).isdigit() else 100
+                # เริ่มโหลดรูปของทุกผลลัพธ์เบื้องหลังพร้อมกันก่อนวาด (ไม่รอทีละรูป)
+                tc = lazy("thumb_cache"); get_thumb_cache().warm([tc.drive_file_id(rows[i][c]) for i in res for c in (14, 10, 11)])
+                for i in res:
+                    v = list(rows[i]); sc = int(v[13]) if str(v[13]).isdigit() else 100
                     with st.expander(f"📌 {v[6]} | {v[1]} (แต้ม: {sc})"):
                         i1, i2, i3 = st.columns(3)
-                        i1.image(get_img_link(v[14]), caption="👤 เจ้าของ", use_container_width=True)
-                        i2.image(get_img_link(v[10]), caption="📝 ทะเบียน", use_container_width=True)
-                        i3.image(get_img_link(v[11]), caption="🏍️ ข้างรถ", use_container_width=True)
+                        i1.image(thumb(v[14]), caption="👤 เจ้าของ", use_container_width=True)
+                        i2.image(thumb(v[10]), caption="📝 ทะเบียน", use_container_width=True)
+                        i3.image(thumb(v[11]), caption="🏍️ ข้างรถ", use_container_width=True)
                         
                         if st.session_state.officer_role in ["admin", "super_admin"]:
                             c_pdf, c_edit = st.columns(2)
-                            c_pdf.download_button("📥 PDF", create_pdf_tra(v, get_img_link(v[10]), get_img_link(v[11]), get_img_link(v[14]), st.session_state.officer_name), f"{v[2]}.pdf", key=f"pdf_{i}")
+                            # คำขอ PDF ผูกกับข้อมูลแถวตอนกด: ข้อมูลเปลี่ยน = ต้องกดสร้างใหม่ (ไม่สร้างเองทุก rerun)
+                            pdf_key = f"pdf_req_{i + 2}"
+                            req = st.session_state.get(pdf_key)
+                            if req and req != tuple(v): req = None; del st.session_state[pdf_key]
+                            if not req and c_pdf.button("📄 สร้าง PDF", key=f"mk_pdf_{i}", use_container_width=True):
+                                req = st.session_state[pdf_key] = tuple(v)
+                                diag.add("pdf_request")  # นับเฉพาะตอนกดจริง (rerun ที่แสดงปุ่มดาวน์โหลดซ้ำไม่นับ)
+                            if req:
+                                with st.spinner("กำลังสร้าง PDF..."): pdf = get_card_pdf(tuple(with_history(v)), st.session_state.officer_name)
+                                c_pdf.download_button("📥 PDF", pdf, f"{v[2]}.pdf", mime="application/pdf", key=f"pdf_{i}", use_container_width=True)
                             if st.session_state.officer_role == "super_admin":
                                 if c_edit.button("✏️ แก้ไขข้อมูล", key=f"ed_{i}", use_container_width=True):
-                                    st.session_state.edit_data = v; st.session_state.traffic_page = 'edit'; st.rerun()
+                                    st.session_state.edit_data = v; st.session_state.edit_row = i + 2; st.session_state.traffic_page = 'edit'; st.rerun()
 
                             with st.form(key=f"sc_form_{i}"):
                                 pts = st.number_input("แต้ม", 1, 50, 5); note = st.text_area("เหตุผล")
                                 b1, b2 = st.columns(2)
                                 if b1.form_submit_button("🔴 หักแต้ม", use_container_width=True) and note:
-                                    cell = sheet.find(str(v[2])); new_sc = max(0, sc - pts)
-                                    old_log = str(v[12]) if str(v[12]).lower() != "nan" else ""
-                                    new_log = f"{old_log}\n[{datetime.now(thai_tz).strftime('%d/%m/%Y %H:%M')}] หัก {pts} โดย {st.session_state.officer_name}: {note}"
-                                    sheet.update(range_name=f'M{cell.row}:N{cell.row}', values=[[new_log, str(new_sc)]])
-                                    st.success("บันทึกแล้ว!"); st.session_state.df_tra = None; st.rerun()
+                                    # แถวที่แสดงอยู่ (รหัสซ้ำได้ จึงไม่ใช้ row_of)
+                                    wq.adjust_score(i + 2, -pts, st.session_state.officer_name, note)
+                                    st.success("บันทึกแล้ว!"); st.rerun()
                                 if b2.form_submit_button("🟢 เพิ่มแต้ม", use_container_width=True) and note:
-                                    cell = sheet.find(str(v[2])); new_sc = min(100, sc + pts)
-                                    old_log = str(v[12]) if str(v[12]).lower() != "nan" else ""
-                                    new_log = f"{old_log}\n[{datetime.now(thai_tz).strftime('%d/%m/%Y %H:%M')}] เพิ่ม {pts} โดย {st.session_state.officer_name}: {note}"
-                                    sheet.update(range_name=f'M{cell.row}:N{cell.row}', values=[[new_log, str(new_sc)]])
-                                    st.success("บันทึกแล้ว!"); st.session_state.df_tra = None; st.rerun()
+                                    # แถวที่แสดงอยู่ (รหัสซ้ำได้ จึงไม่ใช้ row_of)
+                                    wq.adjust_score(i + 2, pts, st.session_state.officer_name, note)
+                                    st.success("บันทึกแล้ว!"); st.rerun()
+
+        # โหมดหน้าประตู: ตรวจหลายทะเบียนพร้อมกัน
+        with st.expander("🚧 โหมดหน้าประตู (วางทะเบียนหลายคัน)"):
+            plates = st.text_area("ทะเบียน (บรรทัดละคัน หรือคั่นด้วย ,)", key="gate_plates")
+            if st.button("🔎 ตรวจทั้งหมด", key="gate_go") and plates:
+                out = []
+                for p, hits in s_idx.resolve_plates(plates, roster.rows_of_plate):
+                    if not hits: out.append({"ทะเบียนที่ค้น": p, "ชื่อ": "❌ ไม่พบ", "รหัส": "", "ชั้น": "", "ทะเบียน": "", "แต้ม": ""})
+                    for i in hits:
+                        r = rows[i]; out.append({"ทะเบียนที่ค้น": p, "ชื่อ": r[1], "รหัส": r[2], "ชั้น": r[3], "ทะเบียน": r[6], "แต้ม": r[13] if str(r[13]).isdigit() else "100"})
+                st.dataframe(out, use_container_width=True, hide_index=True)
+
+        # ส่งออก PDF ทั้งห้อง / ทั้งกลุ่ม (ทบทวนวินัยปลายภาค)
+        if st.session_state.officer_role in ["admin", "super_admin"] and not df_tra.empty:
+            with st.expander("📦 ส่งออก PDF ทั้งกลุ่ม"):
+                e1, e2, e3 = st.columns(3)
+                classes = sorted(c for c in df_tra['C3'].unique() if c)
+                cls = e1.selectbox("ชั้น/ห้อง", ["ทั้งหมด"] + classes, key="exp_cls")
+                max_sc = e2.number_input("แต้มต่ำกว่า (101 = ไม่กรอง)", 1, 101, 101, key="exp_sc")
+                as_zip = e3.radio("รูปแบบ", ["PDF รวมไฟล์เดียว", "ZIP แยกรายคน"], key="exp_fmt") == "ZIP แยกรายคน"
+                with diag.span("filter"):
+                    sel = df_tra if cls == "ทั้งหมด" else df_tra[df_tra['C3'] == cls]
+                    if max_sc <= 100: sel = sel[lazy("pandas").to_numeric(sel['C13'], errors='coerce').fillna(100) < max_sc]
+                st.caption(f"พบ {len(sel)} คน")
+                # ไฟล์ที่สร้างแล้วผูกกับตัวเลือก (ห้อง, แต้ม, รูปแบบ) : เปลี่ยนตัวเลือก = ทิ้งไฟล์เดิม
+                exp_key = (cls, max_sc, as_zip)
+                if st.session_state.get('export_file') and st.session_state.export_file[0] != exp_key:
+                    st.session_state.pop('export_file')[1].close()
+                if st.button("🖨️ สร้างไฟล์", key="exp_go", disabled=sel.empty):
+                    if st.session_state.get('export_file'): st.session_state.pop('export_file')[1].close()
+                    bar = st.progress(0, text="กำลังเตรียมรูป...")
+                    jobs = [(with_history(v), (get_img_link(v[10]), get_img_link(v[11]), get_img_link(v[14]))) for v in sel.values.tolist()]
+                    f = lazy("pdf_card").export_cards(jobs, f"ทะเบียนประวัติรถ {SHEET_NAME}", st.session_state.officer_name, as_zip,
+                                                       progress=lambda n, t: bar.progress(n / t, text=f"สร้างแล้ว {n}/{t} คน"), loader=diag.timed("pdf_image", get_thumb_cache().load))
+                    tag = cls.replace("/", "-") if cls != "ทั้งหมด" else "all"
+                    st.session_state.export_file = (exp_key, f, f"cards_{tag}.{'zip' if as_zip else 'pdf'}", "application/zip" if as_zip else "application/pdf")
+                if st.session_state.get('export_file'):
+                    _, f, fname, mime = st.session_state.export_file
+                    # ส่งไฟล์เฉพาะตอนกดดาวน์โหลด (callable) ไม่แนบไปกับทุก rerun
+                    st.download_button(f"📥 ดาวน์โหลด {fname}", lambda f=f: (f.seek(0), f.read())[1], fname, mime=mime, key="exp_dl", on_click="ignore")
 
         if st.session_state.officer_role == "super_admin":
             st.divider()
             with st.expander("⚙️ เมนูเลื่อนชั้นเรียน (Super Admin)"):
                 up_p = st.text_input("รหัสยืนยัน", type="password", key="prom_pwd_final")
-                if st.button("🚀 ตกลงเลื่อนชั้น") and up_p == UPGRADE_PASSWORD:
+                p1c, p2c, p3c = st.columns(3)
+                if p1c.button("👀 ดูตัวอย่าง (ยังไม่บันทึก)", use_container_width=True):
                     try:
-                        all_d = sheet.get_all_values(); h = all_d[0]; rows = all_d[1:]; new_rows = []
-                        for r in rows:
-                            if len(r) > 3:
-                                ol = r[3]
-                                if "ม.1" in ol: r[3] = ol.replace("ม.1", "ม.2")
-                                elif "ม.2" in ol: r[3] = ol.replace("ม.2", "ม.3")
-                                elif "ม.3" in ol: r[3] = "จบการศึกษา 🎓"
-                                elif "ม.4" in ol: r[3] = ol.replace("ม.4", "ม.5")
-                                elif "ม.5" in ol: r[3] = ol.replace("ม.5", "ม.6")
-                                elif "ม.6" in ol: r[3] = "จบการศึกษา 🎓"
-                            new_rows.append(r)
-                        sheet.clear(); sheet.update(range_name='A1', values=[h] + new_rows)
-                        st.success("สำเร็จ!"); st.session_state.df_tra = None; st.rerun()
+                        wq.flush(); roster.refresh(force=True)
+                        st.session_state.prom_plan = lazy("promotion").plan_promotion(roster.rows())
                     except Exception as e: st.error(f"Error: {e}")
+                if st.session_state.get('prom_plan'):
+                    changes, counts = st.session_state.prom_plan
+                    st.dataframe([{"ระดับ": k, "จำนวน (คน)": n} for k, n in sorted(counts.items())], hide_index=True, use_container_width=True)
+                    st.caption(f"รวม {len(changes)} คน จะเปลี่ยนเฉพาะคอลัมน์ชั้นเรียน")
+                    if p2c.button("🚀 ตกลงเลื่อนชั้น", use_container_width=True) and up_p == UPGRADE_PASSWORD:
+                        try:
+                            done, snap = lazy("promotion").apply_promotion(get_sheet_pool(), sheet, changes)
+                            for row, _, _, new in done: roster.patch(row, 3, [new])
+                            del st.session_state['prom_plan']
+                            st.success(f"สำเร็จ! เลื่อนชั้น {len(done)} คน (สำรองค่าเดิมไว้ที่ชีต {snap})")
+                        except Exception as e: st.error(f"Error: {e}")
+                # ย้อนกลับ 2 ขั้น: กดแล้วแสดงชื่อชีตครั้งล่าสุดก่อน -> ยืนยันอีกครั้ง
+                if p3c.button("↩️ ย้อนกลับครั้งล่าสุด", use_container_width=True):
+                    try: st.session_state.prom_rb = lazy("promotion").latest_snapshot(get_sheet_pool())
+                    except Exception as e: st.error(f"Error: {e}")
+                if st.session_state.get('prom_rb'):
+                    rb_name, rb_done = st.session_state.prom_rb
+                    if rb_name is None or rb_done:
+                        st.info(f"การเลื่อนชั้นครั้งล่าสุดย้อนกลับไปแล้ว ({rb_name})" if rb_name else "ไม่พบประวัติการเลื่อนชั้น")
+                        del st.session_state['prom_rb']
+                    else:
+                        st.warning(f"จะย้อนกลับการเลื่อนชั้นตามชีต {rb_name}")
+                        if st.button("✅ ยืนยันย้อนกลับ", key="prom_rb_ok") and up_p == UPGRADE_PASSWORD:
+                            try:
+                                wq.flush(); done, snap = lazy("promotion").rollback_promotion(get_sheet_pool(), sheet, rb_name)
+                                for row, _, old, _ in done: roster.patch(row, 3, [old])
+                                del st.session_state['prom_rb']
+                                st.success(f"ย้อนกลับ {len(done)} คน (ชีต {snap})")
+                            except Exception as e: st.error(f"Error: {e}")
+
+            with st.expander("🧾 ประวัติแต้ม (score_events)"):
+                ev = get_event_log()
+                if st.button("🔍 ตรวจแต้มเทียบกับประวัติ", key="ev_check"):
+                    try:
+                        wq.flush(); ev.refresh(force=True)
+                        bad = lazy("score_events").check_scores(ev, roster.rows())
+                        if bad.empty: st.success("แต้มในชีตตรงกับประวัติทุกคน")
+                        else:
+                            st.warning(f"ไม่ตรง {len(bad)} คน (ถ้ายังไม่ได้ย้ายประวัติเก่า ให้กดปุ่มด้านล่างก่อน)")
+                            st.dataframe(bad, hide_index=True, use_container_width=True)
+                    except Exception as e: st.error(f"Error: {e}")
+                mg_p = st.text_input("รหัสยืนยัน", type="password", key="ev_mig_pwd")
+                if st.button("📦 ย้ายประวัติเก่าจากคอลัมน์ M", key="ev_mig") and mg_p == UPGRADE_PASSWORD:
+                    try:
+                        wq.flush(); roster.refresh(force=True); ev.refresh(force=True)
+                        se = lazy("score_events"); rows = roster.rows()
+                        out, rows_done = se.migrate_legacy(ev, rows)
+                        backup = se.backup_legacy(get_sheet_pool(), rows, rows_done)  # เก็บข้อความเดิมก่อนล้างคอลัมน์ M
+                        ev.append(out)
+                        for row in rows_done: wq.set_cells(row, 12, [""])
+                        wq.flush()
+                        st.success(f"ย้ายแล้ว {len(rows_done)} คน ({len(out)} รายการ)" + (f" ข้อความเดิมเก็บไว้ที่ชีต {backup}" if backup else ""))
+                    except Exception as e: st.error(f"Error: {e}")
+
+            with st.expander("🩺 Diagnostics"):
+                # สรุปผลเฉพาะตอนเปิดสวิตช์ (ตอนปิด ไม่มีงานเพิ่มใน rerun)
+                if st.toggle("แสดงข้อมูลวัดผล", key="diag_on"): diagnostics_panel()
 
     elif st.session_state.traffic_page == 'edit':
         v = st.session_state.edit_data
@@ -229,21 +446,21 @@ def traffic_module():
             nm = st.text_input("ชื่อ-นามสกุล", v[1]); cl = st.text_input("ชั้น", v[3]); pl = st.text_input("ทะเบียน", v[6])
             u1 = st.file_uploader("เปลี่ยนรูปเจ้าของ"); u2 = st.file_uploader("เปลี่ยนรูปหลังรถ"); u3 = st.file_uploader("เปลี่ยนรูปข้างรถ")
             if st.form_submit_button("💾 บันทึก"):
-                cell = sheet.find(str(v[2])); l1, l2, l3 = v[14], v[10], v[11]
-                if u1: l1 = upload_to_drive(u1, f"{v[2]}_F_e.jpg")
-                if u2: l2 = upload_to_drive(u2, f"{v[2]}_B_e.jpg")
-                if u3: l3 = upload_to_drive(u3, f"{v[2]}_S_e.jpg")
-                sheet.update(range_name=f'B{cell.row}:D{cell.row}', values=[[nm, v[2], cl]])
-                sheet.update(range_name=f'G{cell.row}:G{cell.row}', values=[[pl]])
-                sheet.update(range_name=f'K{cell.row}:L{cell.row}', values=[[l2, l3]])
-                sheet.update_cell(cell.row, 15, l1)
-                st.success("แก้ไขแล้ว!"); st.session_state.df_tra = None; st.session_state.traffic_page = 'main'; st.rerun()
+                row = st.session_state.get('edit_row'); l1, l2, l3 = v[14], v[10], v[11]
+                if not row or (roster.get_row(row) or [None] * 3)[2] != v[2]: st.error("ข้อมูลในชีตเปลี่ยนไป กรุณาค้นหาใหม่"); st.stop()
+                ups = upload_to_drive({"F": (u1, f"{v[2]}_F_e.jpg"), "B": (u2, f"{v[2]}_B_e.jpg"), "S": (u3, f"{v[2]}_S_e.jpg")})
+                if None in ups.values(): st.error("❌ อัปโหลดรูปไม่สำเร็จ กรุณาลองใหม่"); st.stop()
+                l1, l2, l3 = ups.get("F", l1), ups.get("B", l2), ups.get("S", l3)
+                wq.set_cells(row, 1, [nm, v[2], cl]); wq.set_cells(row, 6, [pl])
+                wq.set_cells(row, 10, [l2, l3]); wq.set_cells(row, 14, [l1])
+                wq.try_flush()
+                st.success("แก้ไขแล้ว!"); st.session_state.traffic_page = 'main'; st.rerun()
         if st.button("⬅️ ยกเลิก"): st.session_state.traffic_page = 'main'; st.rerun()
 
 # --- 7. Main UI ---
 cl, ct = st.columns([1, 8])
 with cl: 
-    if logo_local_path: st.image(logo_local_path, width=100)
+    if logo_bytes: st.image(logo_bytes, width=100)
 with ct: st.title(f"ระบบจราจรโรงเรียนจันทรุเบกษาอนุสรณ์")
 
 # --- หน้าลงทะเบียน ---
@@ -266,7 +483,11 @@ if st.session_state['page'] == 'student':
         up1, up2, up3 = st.columns(3)
         p1 = up1.file_uploader("1.รูปเจ้าของรถ", type=['jpg','png','jpeg']); p2 = up2.file_uploader("2. รูปทะเบียน", type=['jpg','png','jpeg']); p3 = up3.file_uploader("3. รูปข้างรถ", type=['jpg','png','jpeg'])
         if st.form_submit_button("ส่งข้อมูลลงทะเบียน", type="primary", use_container_width=True):
-            if fname and sid and p1 and p2 and p3:
+            form_ok = fname and sid and p1 and p2 and p3
+            # เช็กรหัสซ้ำจาก index ก่อนอัปโหลดรูป
+            if form_ok and connect_gsheet() and get_roster().row_of(sid) is not None:
+                st.error(f"❌ รหัสนักเรียน {sid} ลงทะเบียนไว้แล้ว (ติดต่อเจ้าหน้าที่เพื่อแก้ไขข้อมูล)")
+            elif form_ok:
                 try:
                     # --- 🚩 เริ่มเพิ่มระบบแจ้งสถานะตรงนี้ ---
                     progress_bar = st.progress(0)
@@ -274,25 +495,28 @@ if st.session_state['page'] == 'student':
                     
                     sheet = connect_gsheet()
                     
-                    # อัปโหลดรูปที่ 1
-                    status_text.info("กำลังอัปโหลดรูปหน้าเจ้าของรถ (30%)...")
-                    l1 = upload_to_drive(p1, f"{sid}_F.jpg")
-                    progress_bar.progress(30)
-                    
-                    # อัปโหลดรูปที่ 2
-                    status_text.info("กำลังอัปโหลดรูปทะเบียนรถ (60%)...")
-                    l2 = upload_to_drive(p2, f"{sid}_B.jpg")
-                    progress_bar.progress(60)
-                    
-                    # อัปโหลดรูปที่ 3
-                    status_text.info("กำลังอัปโหลดรูปข้างรถ (90%)...")
-                    l3 = upload_to_drive(p3, f"{sid}_S.jpg")
+                    # อัปโหลด 3 รูปพร้อมกัน ; รูปที่สำเร็จแล้วจำไว้ใน session กดส่งซ้ำจะอัปโหลดเฉพาะรูปที่ยังไม่สำเร็จ
+                    done = st.session_state.setdefault('reg_uploads', {})
+                    photos = {"F": p1, "B": p2, "S": p3}
+                    ukey = lambda k: (str(sid), k, photos[k].name, photos[k].size)
+                    todo = {k: (f, f"{sid}_{k}.jpg") for k, f in photos.items() if ukey(k) not in done}
+                    status_text.info(f"กำลังอัปโหลดรูป {len(todo)} รูป...")
+                    links = upload_to_drive(todo, progress=lambda n, t: progress_bar.progress(int(90 * n / t)))
+                    for k, link in links.items():
+                        if link: done[ukey(k)] = link
+                    l1, l2, l3 = (done.get(ukey(k)) for k in ("F", "B", "S"))
                     progress_bar.progress(90)
                     
-                    if l1 and l2 and l3:
+                    if not (l1 and l2 and l3):
+                        failed = [n for k, n in (("F", "รูปเจ้าของรถ"), ("B", "รูปทะเบียน"), ("S", "รูปข้างรถ")) if not done.get(ukey(k))]
+                        status_text.error(f"❌ อัปโหลด {', '.join(failed)} ไม่สำเร็จ กดส่งอีกครั้งเพื่อลองเฉพาะรูปที่ยังไม่สำเร็จ")
+                    else:
                         status_text.info("กำลังบันทึกข้อมูลลงฐานข้อมูล (100%)...")
                         new_d = [datetime.now().strftime('%d/%m/%Y %H:%M'), f"{pre}{fname}", str(sid), f"{lv}/{rm}", brand, color, plate, ls, ts, hs, l2, l3, "", "100", l1, str(pin)]
-                        sheet.append_row(new_d)
+                        # append ไม่ถูกส่งซ้ำอัตโนมัติ ; ถ้าล้ม (แถวอาจเข้าไปแล้ว) โหลดชีตใหม่ก่อนเช็กรหัสซ้ำรอบหน้า
+                        try: res = sheet.append_row(new_d)
+                        except Exception: get_roster().invalidate(); raise
+                        get_roster().append(new_d, res); st.session_state.reg_uploads = {}
                         
                         progress_bar.progress(100)
                         status_text.success("✅ ลงทะเบียนสำเร็จเรียบร้อย!")
@@ -315,9 +539,8 @@ elif st.session_state['page'] == 'portal':
     with st.form("portal_login"):
         sid_p, spin_p = st.text_input("รหัสนักเรียน"), st.text_input("PIN6หลัก", type="password")
         if st.form_submit_button("🔓 แสดงบัตร", use_container_width=True, type="primary"):
-            sheet = connect_gsheet(); df = pd.DataFrame(sheet.get_all_values())
-            user = df[(df.iloc[:, 2] == sid_p) & (df.iloc[:, 15] == spin_p)]
-            if not user.empty: st.session_state.portal_user = user.iloc[0].tolist()
+            connect_gsheet(); _, user = get_roster().find(sid_p, pin=spin_p)
+            if user and sid_p.strip() and user[15] == spin_p: st.session_state.portal_user = user
             else: st.error("ข้อมูลไม่ถูกต้อง")
     if 'portal_user' in st.session_state:
         v = st.session_state.portal_user; sc_p = int(v[13]) if str(v[13]).isdigit() else 100
@@ -327,7 +550,7 @@ elif st.session_state['page'] == 'portal':
             <div class="atm-card">
                 <div class="atm-header"><div class="atm-school-name">{l_tag}ระบบจราจรโรงเรียนจันทรุเบกษาอนุสร</div></div>
                 <div style="display: flex; gap: 20px; margin-top: 15px;">
-                    <img src="{get_img_link(v[14])}" class="atm-photo">
+                    <img src="{thumb_src(v[14])}" class="atm-photo">
                     <div style="flex: 1; color: #1e293b; line-height: 1.6;">
                         <div style="font-size: 1.2rem; font-weight: bold; border-bottom: 2px solid #eee; margin-bottom: 5px; color: #1e3a8a;">{v[1]}</div>
                         <div style="font-size: 0.9rem;">🆔 รหัส {v[2]} | ทะเบียน {v[6]}</div>
@@ -356,3 +579,12 @@ elif st.session_state['page'] == 'teacher':
         c1.subheader(f"👋 สวัสดี: {st.session_state.officer_name}")
         if c2.button("🚪 ออกจากระบบ", type="secondary"): st.session_state.clear(); st.rerun()
         st.divider(); traffic_module()
+
+# --- ⏱️ จบ rerun: บันทึกลง diagnostics ; rerun แรกของ process (cold start) พิมพ์รายงานเวลาลง log ---
+run_sec = time.perf_counter() - RUN_T0
+diag.end(st.session_state.get('page', ''))
+boot = boot_stats()
+if boot["first_run"] is None:
+    boot["first_run"] = run_sec
+    imports = ", ".join(f"{k} {v:.2f}s" for k, v in boot["imports"].items()) or "-"
+    print(f"[startup] first run {run_sec:.2f}s (page={st.session_state.get('page', '')}) lazy imports: {imports}", flush=True)
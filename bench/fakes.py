@@ -0,0 +1,261 @@
+# ✅ ของปลอมสำหรับ benchmark แบบ offline (ไม่ต่อ Google จริง)
+# - FakeBook / FakeWorksheet: ชีตในหน่วยความจำ รองรับคำสั่ง gspread ที่แอปใช้
+#   (get_all_values, find, update, append_row, clear, batch_get, batch_update, col_values ...)
+# - FakePool: SheetPool ที่ต่อกับ FakeBook แทนการ authorize จริง (retry/backoff ทำงานเหมือนเดิม)
+# - FakeUploadSession: แทน requests.Session ของ photo_upload (GAS_APP_URL)
+# - fake_thumbnail: แทนการโหลด thumbnail จาก Drive (ใช้เป็น fetch ของ ThumbCache)
+# - Faults: หน่วงเวลาทุกคำสั่ง + สุ่ม error quota (429) ; นับจำนวนครั้งของแต่ละคำสั่งไว้ใน calls
+import io
+import random
+import threading
+import time
+from collections import Counter
+
+import gspread
+import requests
+from gspread.cell import Cell
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+from sheet_pool import SheetPool
+
+HEADER = ["วันที่", "ชื่อ-นามสกุล", "รหัส", "ชั้น", "ยี่ห้อ", "สี", "ทะเบียน", "ใบขับขี่", "ภาษี", "หมวก",
+          "รูปหลังรถ", "รูปข้างรถ", "ประวัติ", "คะแนน", "รูปเจ้าของ", "PIN"]
+TITLES = ("นาย", "นางสาว", "เด็กชาย", "เด็กหญิง")
+FIRST = ("สมชาย", "สมหญิง", "ธนากร", "กิตติพัฒน์", "ณัฐธิดา", "ปวีณา", "วรเมธ", "ศุภชัย", "อรอุมา", "ภูริช", "ชนิกานต์", "พีรพล")
+LAST = ("ใจดี", "ศรีสุข", "ทองคำ", "วงศ์ไทย", "บุญมา", "แก้วมณี", "รัตนพันธ์", "สุวรรณ", "มั่นคง", "เพชรรัตน์")
+LETTERS = "กขคงจฉชฌญฎฐณดตถทธนบปผพฟภมยรลวศษสหฬอฮ"
+PROVINCES = ("ชลบุรี", "ระยอง", "จันทบุรี", "กรุงเทพมหานคร")
+BRANDS = ("Honda", "Yamaha", "Suzuki", "GPX", "Kawasaki")
+ROOMS = 13
+
+
+class Faults:
+    def __init__(self, latency=0.0, jitter=0.0, quota_rate=0.0, seed=0):
+        self.latency = latency        # วินาทีที่หน่วงทุกคำสั่ง
+        self.jitter = jitter          # สุ่มหน่วงเพิ่ม 0..jitter วินาที
+        self.quota_rate = quota_rate  # โอกาสที่คำสั่งจะโดน 429 (0-1)
+        self.calls = Counter()
+        self.quota_errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def hit(self, name):
+        # นับคำสั่ง + หน่วงเวลา ; คืน True ถ้าคำสั่งนี้ควรล้มด้วย quota
+        with self._lock:
+            self.calls[name] += 1
+            quota = self._rng.random() < self.quota_rate
+            if quota: self.quota_errors += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay: time.sleep(delay)
+        return quota
+
+    def snapshot(self):
+        with self._lock: return Counter(self.calls)
+
+
+class _Response:
+    # พอให้ gspread.exceptions.APIError อ่าน error ได้
+    def __init__(self, code, message, status):
+        self.status_code, self.text = code, message
+        self._body = {"error": {"code": code, "message": message, "status": status}}
+
+    def json(self):
+        return self._body
+
+
+def quota_error():
+    return gspread.exceptions.APIError(_Response(429, "Quota exceeded (fake)", "RESOURCE_EXHAUSTED"))
+
+
+def _start(rng):
+    # "Sheet1!B3:C4" -> (3, 2)
+    return a1_to_rowcol(rng.split("!")[-1].split(":")[0])
+
+
+class FakeWorksheet:
+    def __init__(self, book, title, rows=None):
+        self.spreadsheet = book
+        self.title = title
+        self._rows = [list(r) for r in rows or []]
+        self._lock = threading.Lock()
+
+    def _hit(self, name):
+        if self.spreadsheet.faults.hit(name): raise quota_error()
+
+    def _set(self, row, col, val):
+        while len(self._rows) < row: self._rows.append([])
+        r = self._rows[row - 1]
+        if len(r) < col: r += [""] * (col - len(r))
+        r[col - 1] = str(val)
+
+    def _write(self, rng, values):
+        row, col = _start(rng)
+        for i, vals in enumerate(values):
+            for k, val in enumerate(vals): self._set(row + i, col + k, val)
+
+    # --- อ่าน ---
+    def get_all_values(self, **kwargs):
+        self._hit("get_all_values")
+        with self._lock: return [list(r) for r in self._rows]
+
+    def find(self, query, in_row=None, in_column=None, **kwargs):
+        self._hit("find")
+        with self._lock:
+            for i, r in enumerate(self._rows, 1):
+                if in_row and i != in_row: continue
+                for c, val in enumerate(r, 1):
+                    if (not in_column or c == in_column) and val == str(query): return Cell(i, c, val)
+        return None
+
+    def col_values(self, col, **kwargs):
+        self._hit("col_values")
+        with self._lock: vals = [r[col - 1] if len(r) >= col else "" for r in self._rows]
+        while vals and vals[-1] == "": vals.pop()
+        return vals
+
+    def batch_get(self, ranges, **kwargs):
+        self._hit("batch_get")
+        out = []
+        with self._lock:
+            for rng in ranges:
+                row, col = _start(rng)
+                val = self._rows[row - 1][col - 1] if row <= len(self._rows) and col <= len(self._rows[row - 1]) else ""
+                out.append([[val]] if val != "" else [])
+        return out
+
+    # --- เขียน ---
+    def update(self, *args, range_name=None, values=None, **kwargs):
+        # รับได้ทั้ง update(values, range_name) แบบ gspread 6 และ update(range_name, values) แบบเก่า
+        if args and isinstance(args[0], str): range_name, args = args[0], args[1:]
+        if args: values = args[0]
+        self._hit("update")
+        with self._lock: self._write(range_name or "A1", values)
+        return {"updatedRange": f"{self.title}!{range_name or 'A1'}"}
+
+    def batch_update(self, data, **kwargs):
+        self._hit("batch_update")
+        with self._lock:
+            for d in data: self._write(d["range"], d["values"])
+        return {"totalUpdatedCells": sum(len(v) for d in data for v in d["values"])}
+
+    def append_row(self, values, **kwargs):
+        self._hit("append_row")
+        with self._lock:
+            self._rows.append([str(v) for v in values]); n = len(self._rows)
+        return {"updates": {"updatedRange": f"{self.title}!A{n}:{rowcol_to_a1(n, len(values))}"}}
+
+    def append_rows(self, values, **kwargs):
+        self._hit("append_rows")
+        with self._lock:
+            first = len(self._rows) + 1
+            self._rows += [[str(v) for v in r] for r in values]
+        return {"updates": {"updatedRange": f"{self.title}!A{first}"}}
+
+    def clear(self):
+        self._hit("clear")
+        with self._lock: self._rows = []
+
+    def update_title(self, title):
+        self._hit("update_title")
+        self.title = title
+
+
+class FakeBook:
+    def __init__(self, rows, faults=None):
+        self.id = "fake-spreadsheet"
+        self.faults = faults or Faults()
+        self._sheets = [FakeWorksheet(self, "Sheet1", rows)]
+
+    @property
+    def sheet1(self):
+        return self._sheets[0]
+
+    def _hit(self, name):
+        if self.faults.hit(name): raise quota_error()
+
+    def worksheet(self, title):
+        self._hit("worksheet")
+        for ws in self._sheets:
+            if ws.title == title: return ws
+        raise gspread.exceptions.WorksheetNotFound(title)
+
+    def worksheets(self, **kwargs):
+        self._hit("worksheets")
+        return list(self._sheets)
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._hit("add_worksheet")
+        if any(ws.title == title for ws in self._sheets):
+            raise gspread.exceptions.APIError(_Response(400, f'A sheet with the name "{title}" already exists.', "INVALID_ARGUMENT"))
+        ws = FakeWorksheet(self, title); self._sheets.append(ws)
+        return ws
+
+
+class FakePool(SheetPool):
+    # ข้ามการ authorize/open จริง ; error quota ยังผ่าน retry + backoff ของ SheetPool ตามปกติ
+    def __init__(self, book, **kwargs):
+        super().__init__({}, "fake", **kwargs)
+        self.book = book
+
+    def _connect(self):
+        if self.book.faults.hit("open"): raise quota_error()
+        self.sheet_key = self.book.id
+        self._client, self._ws = self.book, self.book.sheet1
+
+
+class _JsonResponse:
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeUploadSession:
+    # แทน requests.Session ของ photo_upload: ตอบเหมือน GAS (status/link) ; โดน quota = status error
+    def __init__(self, faults):
+        self.faults = faults
+        self.bytes = 0
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        failed = self.faults.hit("gas_upload")
+        with self._lock:
+            self.bytes += len((json or {}).get("file", "")); self._n += 1; n = self._n
+        if failed: return _JsonResponse({"status": "error", "message": "Service invoked too many times"})
+        return _JsonResponse({"status": "success", "link": f"https://drive.google.com/file/d/up{n}/view"})
+
+
+def make_jpeg(size, quality=85):
+    # รูป noise (บีบอัดได้น้อย ใกล้เคียงรูปถ่ายจริงมากกว่าสีพื้น)
+    from PIL import Image
+    img = Image.merge("RGB", [Image.effect_noise(size, 48) for _ in range(3)])
+    out = io.BytesIO(); img.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def fake_thumbnail(faults, size=(800, 600)):
+    # fetch สำหรับ ThumbCache: คืนรูปขนาดเดียวกับ thumbnail sz=w800 ของ Drive
+    data = make_jpeg(size)
+    def fetch(file_id):
+        if faults.hit("drive_thumbnail"): raise requests.HTTPError("429 Too Many Requests (fake)")
+        return data
+    return fetch
+
+
+def make_rows(n, seed=0):
+    # ข้อมูลนักเรียน n คน (+ header) รูปแบบเดียวกับที่หน้าลงทะเบียนบันทึก
+    rng = random.Random(seed)
+    rows = [list(HEADER)]
+    for i in range(n):
+        lv = rng.randint(1, 6)
+        plate = f"{rng.randint(1, 9)}{rng.choice(LETTERS)}{rng.choice(LETTERS)} {rng.randint(1, 9999)} {rng.choice(PROVINCES)}"
+        score = 100 if rng.random() < 0.8 else rng.randrange(0, 100, 5)
+        rows.append([
+            "01/06/2026 08:00", f"{rng.choice(TITLES)}{rng.choice(FIRST)} {rng.choice(LAST)}", str(10000 + i),
+            f"ม.{lv}/{rng.randint(1, ROOMS)}", rng.choice(BRANDS), "ดำ", plate, "✅ มี", "✅ ปกติ", "✅ มี",
+            f"https://drive.google.com/file/d/b{i}/view", f"https://drive.google.com/file/d/s{i}/view", "",
+            str(score), f"https://drive.google.com/file/d/f{i}/view", f"{i % 1000000:06d}",
+        ])
+    return rows
@@ -0,0 +1,202 @@
+# ✅ Benchmark แบบ offline ของเส้นทางหลักในแอป (ใช้ของปลอมใน bench/fakes.py แทน Google ทั้งหมด)
+# วิธีใช้ (รันจากโฟลเดอร์หลักของ repo):
+#   python -m bench.run                                   # 1k / 10k / 50k แถว ทุก scenario
+#   python -m bench.run --rows 1000 --only search portal  # เลือกขนาด/scenario
+#   python -m bench.run --latency 0.05 --jitter 0.05 --quota 0.02 --json out.json
+# ผลแต่ละ scenario: p50/p95 ต่อรอบ (ms), จำนวนคำสั่งที่ยิงออกภายนอกต่อรอบ, หน่วยความจำสูงสุด (tracemalloc, 1 รอบแยก)
+# รอบที่ล้ม (error หลุดออกมาถึงผู้ใช้) แสดงเป็น FAILED ท้ายบรรทัด
+# หมายเหตุ: รอบวัดเวลาไม่เปิด tracemalloc (tracemalloc ทำให้ช้าลงหลายเท่า) จึงวัดหน่วยความจำอีกรอบต่างหาก
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+import photo_upload
+from bench.fakes import FakeBook, FakePool, FakeUploadSession, Faults, fake_thumbnail, make_jpeg, make_rows
+from pdf_card import create_pdf_tra, export_cards
+from promotion import apply_promotion, plan_promotion, rollback_promotion
+from roster import RosterStore
+from score_events import EventLog
+from search_index import SearchIndex
+from thumb_cache import ThumbCache
+from write_queue import WriteQueue
+
+SIZES = (1000, 10000, 50000)
+GAS_URL = "https://script.google.com/macros/s/fake/exec"
+OFFICER = "bench"
+
+
+class World:
+    # ทุกอย่างที่ app.py สร้างผ่าน cache_resource แต่ต่อกับชีตปลอม
+    def __init__(self, n, faults, backoff):
+        self.n = n
+        self.faults = faults
+        self.rng = random.Random(n)
+        self.book = FakeBook(make_rows(n), faults)
+        self.pool = FakePool(self.book, backoff=backoff)
+        self.sheet = self.pool.sheet
+        self.roster = RosterStore(self.sheet, ttl=10 ** 9)
+        self.events = EventLog(self.pool, ttl=10 ** 9)
+        self.wq = WriteQueue(self.sheet, self.roster, self.events, flush_sec=10 ** 9, flush_ops=10 ** 9)
+        self.thumbs = ThumbCache(fetch=fake_thumbnail(faults), disk_dir=None)
+        self.index = None
+        self.photo = make_jpeg((2000, 1500))  # ขนาดรูปจากกล้องมือถือหลังส่งผ่าน file_uploader
+        self.next_sid = 90000000
+        photo_upload._session = FakeUploadSession(faults)
+        self.roster.refresh(force=True)
+
+    def sid(self):
+        return str(10000 + self.rng.randrange(self.n))
+
+
+# --- scenarios: (ชื่อ, จำนวนรอบ, setup(world), op(world)) ---
+def roster_load(w):
+    w.roster.refresh(force=True)
+
+
+def registration(w):
+    # เหมือนหน้าลงทะเบียน: เช็กรหัสซ้ำจาก index -> อัปโหลด 3 รูปพร้อมกัน -> append_row -> patch roster
+    w.next_sid += 1; sid = str(w.next_sid)
+    if w.roster.row_of(sid) is not None: raise RuntimeError("duplicate sid")
+    links = photo_upload.upload_photos(GAS_URL, "folder", {k: (w.photo, f"{sid}_{k}.jpg") for k in ("F", "B", "S")})
+    if None in links.values(): return
+    new_d = ["01/06/2026 08:00", "นายทดสอบ ระบบ", sid, "ม.4/1", "Honda", "ดำ", "1กก 1234", "✅ มี", "✅ ปกติ", "✅ มี",
+             links["B"], links["S"], "", "100", links["F"], "123456"]
+    w.roster.append(new_d, w.sheet.append_row(new_d))
+
+
+def search_build(w):
+    w.index = SearchIndex(w.roster.rows())
+
+
+def search_setup(w):
+    if w.index is None: search_build(w)
+    rows = w.roster.rows()
+    w.queries = []
+    for _ in range(200):
+        r = rows[w.rng.randrange(len(rows))]; kind = w.rng.randrange(3)
+        w.queries.append(r[2][:3 + w.rng.randrange(3)] if kind == 0 else r[6].split()[0][1:] if kind == 1 else r[1].split()[-1][:3])
+
+
+def search(w):
+    w.index.search(w.queries.pop() if w.queries else "สม")
+
+
+def portal(w):
+    # เข้าดูบัตร: หาแถวจากรหัส + เช็ก PIN + รูปหน้า (ผ่าน cache รูป)
+    _, user = w.roster.find(w.sid())
+    if user and user[15]: w.thumbs.load(user[14], 220)
+
+
+def score_deduction(w):
+    # หักแต้มผ่านคิวเขียน ; flush ทุก 20 รายการ (ค่าเริ่มต้นของ WRITE_FLUSH_OPS)
+    w.wq.adjust_score(w.roster.row_of(w.sid()), -5, OFFICER, "ไม่สวมหมวกกันน็อก")
+    if w.wq.pending() >= 20: w.wq.flush()
+
+
+def pdf_card(w):
+    _, v = w.roster.find(w.sid())
+    create_pdf_tra(v, v[10], v[11], v[14], OFFICER, loader=w.thumbs.load).getvalue()
+
+
+def pdf_export(w):
+    # ส่งออกทั้งห้อง (ห้องเดียวกับที่เจ้าหน้าที่เลือกจาก dropdown)
+    rows = w.roster.rows(); cls = rows[w.rng.randrange(len(rows))][3]
+    jobs = [(v, (v[10], v[11], v[14])) for v in rows if v[3] == cls]
+    export_cards(jobs, "ทะเบียนประวัติรถ", OFFICER, loader=w.thumbs.load).close()
+
+
+def promotion(w):
+    # dry-run + เลื่อนชั้นจริง แล้วย้อนกลับ (ข้อมูลกลับสภาพเดิมสำหรับรอบถัดไป)
+    changes, _ = plan_promotion(w.roster.rows())
+    done, _ = apply_promotion(w.pool, w.sheet, changes)
+    for row, _, _, new in done: w.roster.patch(row, 3, [new])
+    done, _ = rollback_promotion(w.pool, w.sheet)
+    for row, _, old, _ in done: w.roster.patch(row, 3, [old])
+
+
+SCENARIOS = [
+    ("roster_load", 3, None, roster_load),
+    ("registration", 10, None, registration),
+    ("search_build", 3, None, search_build),
+    ("search", 200, search_setup, search),
+    ("portal", 200, None, portal),
+    ("score_deduction", 200, None, score_deduction),
+    ("pdf_card", 10, None, pdf_card),
+    ("pdf_export", 2, None, pdf_export),
+    ("promotion", 2, None, promotion),
+]
+
+
+def percentile(vals, p):
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(p / 100 * (len(vals) - 1))))]
+
+
+def run_scenario(w, name, rounds, setup, op):
+    if setup: setup(w)
+    before, q0 = w.faults.snapshot(), w.faults.quota_errors
+    times, errors = [], Counter()
+    for _ in range(rounds):
+        t = time.perf_counter()
+        try: op(w)
+        except Exception as e: errors[type(e).__name__] += 1  # รอบที่ล้ม (เช่น 429 เกินจำนวน retry) ยังนับเวลา
+        times.append(time.perf_counter() - t)
+    calls = w.faults.snapshot() - before
+    # หน่วยความจำ: อีก 1 รอบภายใต้ tracemalloc (ไม่นับรวมในเวลา)
+    if setup: setup(w)
+    tracemalloc.start()
+    try: op(w)
+    except Exception: pass
+    finally: peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return {
+        "rows": w.n, "scenario": name, "rounds": rounds,
+        "p50_ms": round(statistics.median(times) * 1000, 2), "p95_ms": round(percentile(times, 95) * 1000, 2),
+        "calls_per_round": round(sum(calls.values()) / rounds, 2), "calls": dict(sorted(calls.items())),
+        "quota_errors": w.faults.quota_errors - q0, "failed": dict(errors), "peak_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def print_row(r):
+    calls = ", ".join(f"{k}={v}" for k, v in r["calls"].items()) or "-"
+    failed = "".join(f" FAILED {k}={v}" for k, v in r["failed"].items())
+    print(f"{r['rows']:>7} {r['scenario']:<16} {r['rounds']:>5} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+          f"{r['calls_per_round']:>8.2f} {r['quota_errors']:>5} {r['peak_mb']:>8.2f}  {calls}{failed}", flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline benchmark (fake Sheets / GAS / Drive)")
+    ap.add_argument("--rows", type=int, nargs="+", default=list(SIZES), help="จำนวนแถวในชีต")
+    ap.add_argument("--only", nargs="+", choices=[s[0] for s in SCENARIOS], help="เลือกเฉพาะ scenario")
+    ap.add_argument("--latency", type=float, default=0.0, help="หน่วงทุกคำสั่งภายนอก (วินาที)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="สุ่มหน่วงเพิ่ม 0..jitter วินาที")
+    ap.add_argument("--quota", type=float, default=0.0, help="โอกาสโดน 429 ต่อคำสั่ง (0-1)")
+    ap.add_argument("--backoff", type=float, default=0.5, help="backoff ของ SheetPool (วินาที)")
+    ap.add_argument("--rounds", type=float, default=1.0, help="คูณจำนวนรอบของทุก scenario")
+    ap.add_argument("--json", help="บันทึกผลเป็นไฟล์ JSON (ไว้เทียบกับรอบก่อน)")
+    args = ap.parse_args(argv)
+    os.chdir(ROOT)  # ฟอนต์ PDF / โลโก้ อ้างอิงจากโฟลเดอร์หลัก
+
+    results = []
+    print(f"{'rows':>7} {'scenario':<16} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'calls/op':>8} {'429':>5} {'peak MB':>8}  calls")
+    for n in args.rows:
+        w = World(n, Faults(args.latency, args.jitter, args.quota), args.backoff)
+        for name, rounds, setup, op in SCENARIOS:
+            if args.only and name not in args.only: continue
+            r = run_scenario(w, name, max(1, int(rounds * args.rounds)), setup, op)
+            results.append(r); print_row(r)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, ensure_ascii=False, indent=1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
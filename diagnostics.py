@@ -0,0 +1,143 @@
+# ✅ วัดผลแบบเบาๆ สำหรับเมนู Diagnostics (Super Admin)
+# - นับจำนวนครั้ง / เวลา / ไบต์ ของงานภายนอก (Google Sheets, อัปโหลดรูป, โหลดรูป PDF) และงานกรองข้อมูล
+# - แยกเป็นราย rerun และราย session ; ทุกอย่างเก็บใน deque / OrderedDict ที่จำกัดขนาด
+# - บันทึก 1 ครั้ง = perf_counter 2 ครั้ง + บวก Counter ใต้ lock ; การสรุปผลทำเฉพาะตอนเปิดดู
+# - rerun ปัจจุบันเก็บใน ContextVar: thread ลูกที่ submit ด้วย copy_context().run (เช่นอัปโหลดรูป) นับเข้า rerun เดียวกัน
+#   งานที่ไม่มี rerun (คิวเขียนเบื้องหลัง) นับเฉพาะยอดรวมของ process
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+RUNS = 200       # rerun ล่าสุดที่เก็บไว้
+API_LOG = 10000  # เวลาของ HTTP request ไป Google ล่าสุด (ใช้นับต่อนาที)
+SESSIONS = 100   # session ล่าสุดที่เก็บสรุปไว้
+
+_run = ContextVar("diagnostics_run", default=None)
+
+
+class Run:
+    def __init__(self, session):
+        self.session = session
+        self.page = ""
+        self.ts = time.time()
+        self.t0 = self.last = time.perf_counter()
+        self.sec = 0.0
+        self.interrupted = False
+        self.calls, self.secs, self.bytes = Counter(), Counter(), Counter()
+
+    def add(self, kind, sec, nbytes, calls):
+        self.calls[kind] += calls; self.secs[kind] += sec; self.bytes[kind] += nbytes
+        self.last = time.perf_counter()
+
+
+class Span:
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+class Diagnostics:
+    def __init__(self, runs=RUNS, api_log=API_LOG, sessions=SESSIONS):
+        self.runs = deque(maxlen=runs)
+        self.api = deque(maxlen=api_log)  # เวลา (time.time) ของแต่ละ request
+        self.max_sessions = sessions
+        self.sessions = OrderedDict()     # session id -> Counter สรุป
+        self.calls, self.secs, self.bytes = Counter(), Counter(), Counter()
+        self.methods = Counter()          # คำสั่ง gspread -> จำนวนครั้ง
+        self.errors = Counter()
+        self._open = {}                   # session id -> rerun ที่ยังไม่จบ
+        self._lock = threading.Lock()
+
+    # --- rerun ---
+    def begin(self, session):
+        # rerun ก่อนหน้าที่จบด้วย st.rerun / st.stop (ไม่ถึง end) ปิดด้วยเวลาที่มีงานครั้งล่าสุด
+        run = Run(session)
+        with self._lock: prev, self._open[session] = self._open.get(session), run
+        if prev is not None: self._close(prev, prev.last - prev.t0, True)
+        _run.set(run)
+
+    def end(self, page):
+        run = _run.get()
+        if run is None: return 0.0
+        run.page = page; sec = time.perf_counter() - run.t0
+        self._close(run, sec, False)
+        return sec
+
+    def _close(self, run, sec, interrupted):
+        if _run.get() is run: _run.set(None)
+        run.sec, run.interrupted = sec, interrupted
+        with self._lock:
+            if self._open.get(run.session) is run: del self._open[run.session]
+            self.runs.append(run)
+            s = self.sessions.pop(run.session, None) or Counter()
+            s["reruns"] += 1; s["sec"] += sec; s["calls"] += sum(run.calls.values()); s["bytes"] += sum(run.bytes.values())
+            s["last"] = run.ts
+            self.sessions[run.session] = s
+            while len(self.sessions) > self.max_sessions: self.sessions.popitem(last=False)
+
+    # --- บันทึก ---
+    def add(self, kind, sec=0.0, nbytes=0, calls=1, run=None):
+        run = run or _run.get()
+        with self._lock:
+            self.calls[kind] += calls; self.secs[kind] += sec; self.bytes[kind] += nbytes
+            if run is not None: run.add(kind, sec, nbytes, calls)
+
+    @contextmanager
+    def span(self, kind):
+        # with diag.span("upload_to_drive") as sp: ... ; sp.bytes = ขนาดข้อมูล (ถ้ารู้)
+        sp, t = Span(), time.perf_counter()
+        try: yield sp
+        finally: self.add(kind, time.perf_counter() - t, sp.bytes)
+
+    def timed(self, kind, fn, bind=True):
+        # ห่อฟังก์ชัน: นับเวลา + ขนาดผลลัพธ์ (ถ้าเป็น bytes)
+        # bind=True: ถูกเรียกจาก thread อื่น (เช่น loader รูปของ PDF) ก็นับเข้า rerun ที่สร้าง wrapper
+        # bind=False: นับเข้า rerun ของผู้เรียกขณะนั้น (ใช้กับของที่สร้างครั้งเดียวต่อ process)
+        bound = _run.get() if bind else None
+        def wrapper(*args, **kwargs):
+            t = time.perf_counter(); res = None
+            try: res = fn(*args, **kwargs); return res
+            finally: self.add(kind, time.perf_counter() - t, len(res) if isinstance(res, (bytes, bytearray)) else 0, run=_run.get() or bound)
+        return wrapper
+
+    # --- hook ของ SheetPool / requests ---
+    def sheets_call(self, method, sec, ok):
+        self.add("sheets", sec)
+        with self._lock:
+            self.methods[method] += 1
+            if not ok: self.errors[method] += 1
+
+    def response_hook(self, kind):
+        # requests response hook: นับไบต์ขาไป+ขากลับ ; kind="sheets" นับเป็น request ต่อนาทีเทียบ quota ด้วย
+        def hook(res, *args, **kwargs):
+            body = getattr(res.request, "body", None) or b""
+            self.add(kind, nbytes=len(body) + len(res.content or b""), calls=0 if kind == "sheets" else 1)
+            if kind == "sheets":
+                with self._lock: self.api.append(time.time())
+            return res
+        return hook
+
+    # --- สรุป (เรียกตอนเปิดดูเท่านั้น) ---
+    def per_minute(self, minutes=10):
+        # จำนวน request ไป Google Sheets ในแต่ละนาทีย้อนหลัง (ล่าสุดอยู่ท้าย)
+        now = time.time()
+        with self._lock: ts = list(self.api)
+        out = [0] * minutes
+        for t in ts:
+            k = int((now - t) // 60)
+            if k < minutes: out[minutes - 1 - k] += 1
+        return out
+
+    def slowest(self, n=10):
+        with self._lock: runs = list(self.runs)
+        return sorted(runs, key=lambda r: r.sec, reverse=True)[:n]
+
+    def totals(self):
+        with self._lock:
+            return {k: (self.calls[k], self.secs[k], self.bytes[k]) for k in sorted(self.calls)}
+
+    def session_stats(self):
+        with self._lock: return list(self.sessions.items())
@@ -0,0 +1,156 @@
+# ✅ สร้าง PDF ทะเบียนประวัติรถ (ย้ายมาจาก app.py)
+# - ลงทะเบียนฟอนต์ครั้งเดียวต่อ process
+# - โหลดรูป 3 รูปของบัตรพร้อมกัน (thread) แทนทีละรูป
+# - export_cards: ส่งออกทั้งห้อง/ทั้งกลุ่ม เป็น PDF หลายหน้าไฟล์เดียว หรือ ZIP แยกรายคน
+import io
+import os
+import tempfile
+import textwrap
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+import requests
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+thai_tz = pytz.timezone('Asia/Bangkok')
+FONT_FILE = "THSarabunNew.ttf"
+FONT_BOLD = "THSarabunNew.ttf"
+IMG_TIMEOUT = 5
+EXPORT_WORKERS = 8   # จำนวนบัตรที่โหลดรูปพร้อมกันตอนส่งออกทั้งกลุ่ม
+EXPORT_WINDOW = 24   # โหลดรูปล่วงหน้าไม่เกินกี่บัตร (รูปที่วาดแล้วถูกทิ้ง ไม่ค้างในหน่วยความจำ)
+EXPORT_SPOOL = 64 * 1024 * 1024  # ไฟล์ผลลัพธ์ใหญ่กว่านี้ให้พักลงดิสก์
+# ขนาดพิกเซลสูงสุดของรูปที่ฝังใน PDF (กรอบรูปรถ 230x180pt / รูปหน้า 80x100pt ที่ ~150dpi)
+CAR_PX, FACE_PX = 480, 220
+
+_fonts = None
+_fonts_lock = threading.Lock()
+
+
+def pdf_fonts():
+    global _fonts
+    with _fonts_lock:
+        if _fonts is None:
+            if os.path.exists(FONT_FILE):
+                pdfmetrics.registerFont(TTFont('Thai', FONT_FILE))
+                pdfmetrics.registerFont(TTFont('ThaiBold', FONT_BOLD if os.path.exists(FONT_BOLD) else FONT_FILE))
+                _fonts = ('Thai', 'ThaiBold')
+            else: _fonts = ('Helvetica', 'Helvetica-Bold')
+        return _fonts
+
+
+def fetch_image(url):
+    # None = ไม่มีรูป ; b"" = มีลิงก์แต่โหลดไม่ได้ (วาดกรอบเปล่า)
+    if not url: return None
+    try:
+        res = requests.get(url, timeout=IMG_TIMEOUT); res.raise_for_status()
+        return res.content
+    except Exception: return b""
+
+
+def shrink_image(data, max_px, quality=75):
+    # ย่อรูปก่อนฝังใน PDF ให้ไฟล์รวมหลายร้อยหน้าไม่บวม (ถ้าอ่านรูปไม่ได้ คืนค่าเดิม)
+    if not data: return data
+    try:
+        from PIL import Image
+        img = Image.open(io.BytesIO(data)); img.thumbnail((max_px, max_px))
+        out = io.BytesIO(); img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+    except Exception: return data
+
+
+def load_image(url, max_px):
+    # loader ตั้งต้น: โหลดตรงจาก url แล้วย่อ (แอปส่ง loader ที่ผ่าน cache รูปเข้ามาแทนได้)
+    return shrink_image(fetch_image(url), max_px)
+
+
+CARD_PX = (CAR_PX, CAR_PX, FACE_PX)  # ขนาดรูปตามลำดับ (หลังรถ, ข้างรถ, เจ้าของ)
+
+
+def fetch_images(urls, loader=None):
+    # โหลดรูป 3 รูปของบัตรพร้อมกัน
+    loader = loader or load_image
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex: return list(ex.map(loader, urls, CARD_PX))
+
+
+def fetch_card_images(urls, loader=None):
+    # ใช้ในงานส่งออก: 1 worker ต่อ 1 บัตร (ความขนานมาจากหลายบัตรพร้อมกันอยู่แล้ว)
+    loader = loader or load_image
+    return tuple(loader(u, px) for u, px in zip(urls, CARD_PX))
+
+
+def draw_card(c, vals, images, title, printed_by="N/A"):
+    # วาดบัตร 1 หน้า ; images = (รูปหลังรถ, รูปข้างรถ, รูปเจ้าของ) เป็น bytes
+    fn, fb = pdf_fonts(); width, height = A4
+    c.setFont(fb, 22); c.drawCentredString(width/2, height - 50, title)
+    c.line(50, height - 85, width - 50, height - 85)
+    c.setFont(fn, 16); c.drawString(60, height - 115, f"ชื่อ: {vals[1]}"); c.drawString(350, height - 115, f"ยี่ห้อ: {vals[4]}")
+    c.drawString(60, height - 135, f"ID: {vals[2]}"); c.drawString(350, height - 135, f"ทะเบียน: {vals[6]}")
+    score = str(vals[13]) if str(vals[13]).isdigit() else "100"
+    c.setFont(fb, 18); c.drawString(60, height - 185, f"คะแนนคงเหลือ: {score} คะแนน")
+
+    def draw_img(data, x, y, w, h):
+        try:
+            img = ImageReader(io.BytesIO(data))
+            c.drawImage(img, x, y, width=w, height=h, preserveAspectRatio=True, mask='auto')
+            c.rect(x, y, w, h, stroke=1, fill=0)
+        except: c.rect(x, y, w, h, stroke=1, fill=0)
+    img1, img2, face = images
+    if face is not None: draw_img(face, 460, height - 200, 80, 100)
+    draw_img(img1, 60, height - 415, 230, 180); draw_img(img2, 305, height - 415, 230, 180)
+
+    c.setFont(fb, 14); c.drawString(60, 350, "📝 ประวัติบันทึกคะแนน:")
+    h_text = str(vals[12]) if str(vals[12]).lower() != "nan" else "ไม่พบประวัติ"
+    to = c.beginText(70, 335); to.setLeading(14)
+    for line in h_text.split('\n'):
+        for wl in textwrap.wrap(line, width=90): to.textLine(wl)
+    c.drawText(to)
+
+    c.setFont(fn, 10); c.drawRightString(width-50, 30, f"ผู้พิมพ์: {printed_by} | {datetime.now(thai_tz).strftime('%d/%m/%Y %H:%M')}")
+
+
+def create_pdf_tra(vals, img_url1, img_url2, face_url=None, printed_by="N/A", title="ทะเบียนประวัติรถ", loader=None):
+    # loader(url, max_px) -> bytes (None = ไม่มีรูป, b"" = โหลดไม่ได้)
+    buffer = io.BytesIO(); c = canvas.Canvas(buffer, pagesize=A4)
+    draw_card(c, vals, fetch_images([img_url1, img_url2, face_url], loader), title, printed_by)
+    c.save(); buffer.seek(0); return buffer
+
+
+def export_cards(jobs, title, printed_by="N/A", as_zip=False, progress=None, loader=None):
+    # jobs = [(vals, (url หลังรถ, url ข้างรถ, url เจ้าของ)), ...]
+    # โหลดรูปผ่าน thread pool แบบมีเพดาน แล้ววาดทีละบัตรตามลำดับ ; progress(เสร็จแล้ว, ทั้งหมด)
+    # คืนไฟล์ (SpooledTemporaryFile กรอกลับต้นไฟล์แล้ว) ไม่อ่านเข้าหน่วยความจำ ; ผู้เรียกปิดเองเมื่อไม่ใช้
+    total = len(jobs); out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL)
+    zf = zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) if as_zip else None
+    c = None if as_zip else canvas.Canvas(out, pagesize=A4)
+    names = set()
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as ex:
+        pending, it = deque(), iter(jobs)
+        def submit():
+            job = next(it, None)
+            if job: pending.append((job[0], ex.submit(fetch_card_images, job[1], loader)))
+        for _ in range(EXPORT_WINDOW): submit()
+        done = 0
+        while pending:
+            vals, fut = pending.popleft(); images = fut.result(); submit()
+            if as_zip:
+                buf = io.BytesIO(); cc = canvas.Canvas(buf, pagesize=A4)
+                draw_card(cc, vals, images, title, printed_by); cc.save()
+                name = f"{vals[2] or 'no_id'}.pdf"
+                if name in names: name = f"{vals[2] or 'no_id'}_{done + 1}.pdf"
+                names.add(name); zf.writestr(name, buf.getvalue())
+            else:
+                draw_card(c, vals, images, title, printed_by); c.showPage()
+            done += 1
+            if progress: progress(done, total)
+    if as_zip: zf.close()
+    else: c.save()
+    out.seek(0)
+    return out
@@ -0,0 +1,78 @@
+# ✅ อัปโหลดรูปขึ้น Drive ผ่าน GAS_APP_URL
+# - ย่อ + บีบอัด JPEG ก่อน base64 (รูปมือถือ 4-8 MB เหลือหลักร้อย KB)
+# - ใช้ requests.Session เดียวทั้ง process (connection pool / keep-alive)
+# - ส่งหลายรูปพร้อมกัน และลองใหม่เฉพาะรูปที่ล้มแบบที่แน่ใจว่า GAS ยังไม่ได้บันทึกไฟล์
+#   (เชื่อมต่อไม่ได้ / GAS ตอบ status error) ; timeout ระหว่างรอคำตอบไม่ส่งซ้ำ เพราะไฟล์อาจลง Drive ไปแล้ว
+import base64
+import contextvars
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+
+UPLOAD_TIMEOUT = 20
+UPLOAD_RETRIES = 2
+MAX_PX = 1600
+QUALITY = 80
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        return _session
+
+
+def prepare_photo(data, max_px=MAX_PX, quality=QUALITY):
+    # หมุนตาม EXIF, ย่อด้านยาวไม่เกิน max_px แล้วบันทึกเป็น JPEG ; ถ้าไม่เล็กลงหรืออ่านไม่ได้ ใช้ไฟล์เดิม
+    try:
+        from PIL import Image, ImageOps
+        img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        img.thumbnail((max_px, max_px))
+        out = io.BytesIO(); img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+        return out.getvalue() if out.tell() < len(data) else data
+    except Exception: return data
+
+
+def not_sent(e):
+    # error ตอนเชื่อมต่อ (คำขอยังไม่ถึง GAS) ; HTTPAdapter ห่อ error ช่วงเชื่อมต่อด้วย MaxRetryError
+    # ส่วน error ช่วงรอคำตอบ (ReadTimeout / หลุดกลางทาง) ไม่นับ
+    if isinstance(e, requests.exceptions.ConnectTimeout): return True
+    return isinstance(e, requests.exceptions.ConnectionError) and bool(e.args) and isinstance(e.args[0], MaxRetryError)
+
+
+def upload_photo(url, folder_id, data, filename, retries=UPLOAD_RETRIES):
+    payload = {"folder_id": folder_id, "filename": filename, "file": base64.b64encode(data).decode('utf-8'), "mimeType": "image/jpeg"}
+    for attempt in range(retries + 1):
+        try:
+            body = http_session().post(url, json=payload, timeout=UPLOAD_TIMEOUT).json()
+            if body.get("status") == "success": return body.get("link")
+            # GAS ตอบ status error = ยังไม่ได้สร้างไฟล์ -> ลองใหม่ได้
+        except requests.RequestException as e:
+            if not not_sent(e): return None
+        except ValueError: return None  # คำตอบไม่ใช่ JSON: ไม่รู้ว่าบันทึกไปแล้วหรือยัง
+        if attempt < retries: time.sleep(1 + attempt)
+    return None
+
+
+def upload_photos(url, folder_id, items, max_px=MAX_PX, quality=QUALITY, progress=None):
+    # items = {key: (bytes, filename)} -> {key: link หรือ None} ; progress(เสร็จแล้ว, ทั้งหมด) เรียกจาก thread หลัก
+    if not items: return {}
+    def job(data, filename): return upload_photo(url, folder_id, prepare_photo(data, max_px, quality), filename)
+    links = {}
+    with ThreadPoolExecutor(max_workers=len(items)) as ex:
+        # copy_context: thread ลูกเห็น context เดียวกับผู้เรียก (สถิติต่อ rerun ใน diagnostics)
+        futures = {ex.submit(contextvars.copy_context().run, job, data, fn): key for key, (data, fn) in items.items()}
+        for n, fut in enumerate(as_completed(futures), 1):
+            links[futures[fut]] = fut.result()
+            if progress: progress(n, len(items))
+    return links
@@ -0,0 +1,109 @@
+# ✅ เลื่อนชั้นเรียน (แทน sheet.clear() + เขียนทับทั้งชีต)
+# - แก้เฉพาะคอลัมน์ D และเฉพาะแถวที่ชั้นเปลี่ยนจริง ด้วย batch_update
+# - plan_promotion = dry-run ดูจำนวนแต่ละระดับก่อนยืนยัน
+# - ก่อนเขียนจะเก็บค่าเดิมไว้ในชีต promote_<วันเวลา> เพื่อย้อนกลับ (rollback) ได้
+# - ตอนเขียน/ย้อนกลับ เทียบทั้งรหัส (C) และชั้น (D) ของแถวนั้น : แถวเลื่อน (มีคนลบ/แทรกแถว) จะถูกข้าม
+# - ย้อนกลับได้เฉพาะครั้งล่าสุด (ดูจากเวลาในชื่อชีต promote_/rolledback_) และครั้งเดียว : กดซ้ำไม่ย้อนครั้งก่อนหน้าต่อ
+from collections import Counter
+from datetime import datetime
+
+import gspread
+import pytz
+
+thai_tz = pytz.timezone('Asia/Bangkok')
+COL_ID, COL_CLASS = 2, 3  # C, D
+GRADUATED = "จบการศึกษา 🎓"
+STEPS = (("ม.1", "ม.2"), ("ม.2", "ม.3"), ("ม.3", None), ("ม.4", "ม.5"), ("ม.5", "ม.6"), ("ม.6", None))
+SNAPSHOT_PREFIX = "promote_"
+ROLLEDBACK_PREFIX = "rolledback_"
+BATCH = 1000
+
+
+def promote_class(ol):
+    # คืน (ระดับเดิม, ชั้นใหม่) หรือ None ถ้าไม่ต้องเปลี่ยน (กฎเดียวกับของเดิม)
+    for lv, nxt in STEPS:
+        if lv in ol: return lv, (ol.replace(lv, nxt) if nxt else GRADUATED)
+    return None
+
+
+def plan_promotion(rows):
+    # rows = roster.rows() ; คืน (รายการ [(แถว, รหัส, ชั้นเดิม, ชั้นใหม่)], Counter จำนวนต่อระดับ)
+    changes, counts = [], Counter()
+    for i, r in enumerate(rows):
+        res = promote_class(r[COL_CLASS])
+        if not res or res[1] == r[COL_CLASS]: continue
+        lv, new = res
+        changes.append((i + 2, r[2], r[COL_CLASS], new))
+        counts[f"{lv} → {new if new == GRADUATED else new.split('/')[0]}"] += 1
+    return changes, counts
+
+
+def _current(sheet):
+    # แถว -> (รหัส, ชั้น) ในชีตตอนนี้ (อ่าน 2 คอลัมน์)
+    ids, classes = sheet.col_values(COL_ID + 1), sheet.col_values(COL_CLASS + 1)
+    n = max(len(ids), len(classes))
+    ids, classes = ids + [""] * (n - len(ids)), classes + [""] * (n - len(classes))
+    return {i + 1: (sid.strip(), cl) for i, (sid, cl) in enumerate(zip(ids, classes))}
+
+
+def _write_class(sheet, cells):
+    # cells = [(แถว, ค่า)] -> batch_update เฉพาะช่อง D
+    for k in range(0, len(cells), BATCH):
+        sheet.batch_update([{"range": f"D{row}", "values": [[val]]} for row, val in cells[k:k + BATCH]])
+
+
+def _stamps(pool):
+    # [(เวลาในชื่อ, ชื่อชีต, ย้อนกลับแล้วไหม)] ของชีต promote_ / rolledback_ ทั้งหมด
+    return [(ws.title[len(p):], ws.title, p == ROLLEDBACK_PREFIX) for ws in pool.book_call("worksheets")
+            for p in (SNAPSHOT_PREFIX, ROLLEDBACK_PREFIX) if ws.title.startswith(p)]
+
+
+def _add_snapshot(pool, rows):
+    # ชื่อชีตละเอียดแค่วินาที: เวลาซ้ำกับครั้งก่อน (กด 2 ครั้งในวินาทีเดียว) -> เติม _2, _3 ...
+    base = datetime.now(thai_tz).strftime('%Y%m%d_%H%M%S')
+    taken = {t for t, _, _ in _stamps(pool)}
+    names = [f"{base}_{k}" if k > 1 else base for k in range(1, 10)]  # ไม่เกิน _9 (เรียงตามตัวอักษรได้ถูก)
+    for stamp in [n for n in names if n not in taken]:
+        try:
+            pool.book_call("add_worksheet", title=SNAPSHOT_PREFIX + stamp, rows=rows, cols=4)
+            return SNAPSHOT_PREFIX + stamp
+        except gspread.exceptions.APIError as e:
+            if e.code != 400: raise  # 400 = ชื่อซ้ำ (อีกเครื่องสร้างพร้อมกัน) ลองชื่อถัดไป
+    raise RuntimeError("ตั้งชื่อชีตสำรองไม่ได้ กรุณาลองใหม่")
+
+
+def latest_snapshot(pool):
+    # (ชื่อชีตของการเลื่อนชั้นครั้งล่าสุด, ย้อนกลับไปแล้วหรือยัง) ; (None, False) = ไม่เคยเลื่อนชั้น
+    snaps = _stamps(pool)
+    if not snaps: return None, False
+    _, name, rolled = max(snaps)
+    return name, rolled
+
+
+def apply_promotion(pool, sheet, changes):
+    # เขียนเฉพาะแถวที่ในชีตตอนนี้ยังเป็นรหัสเดิม + "ชั้นเดิม" ในแผน (ถ้ามีคนแก้/ย้ายแถวไประหว่างนั้นจะข้าม)
+    # คืน (รายการที่เขียนจริง, ชื่อชีต snapshot)
+    current = _current(sheet)
+    todo = [c for c in changes if current.get(c[0]) == (str(c[1]).strip(), c[2])]
+    if not todo: return [], None
+    name = _add_snapshot(pool, len(todo) + 1)
+    pool.ws_call(name, "update", range_name="A1", values=[["แถว", "รหัส", "ชั้นเดิม", "ชั้นใหม่"]] + [list(map(str, c)) for c in todo])
+    _write_class(sheet, [(row, new) for row, _, _, new in todo])
+    return todo, name
+
+
+def rollback_promotion(pool, sheet, name=None):
+    # ย้อนกลับครั้งล่าสุด: คืนค่าเดิมเฉพาะแถวที่ยังเป็นรหัสเดิม + "ชั้นใหม่" จากครั้งนั้นอยู่
+    # name = ชื่อชีตที่แสดงให้ยืนยัน (ถ้ามีครั้งใหม่กว่าเกิดขึ้นระหว่างนั้นจะไม่ทำ)
+    latest, rolled = latest_snapshot(pool)
+    if latest is None: return [], None
+    if name is not None and name != latest: raise ValueError(f"มีการเลื่อนชั้น/ย้อนกลับครั้งใหม่กว่า ({latest}) กรุณาตรวจสอบอีกครั้ง")
+    if rolled: raise ValueError(f"การเลื่อนชั้นครั้งล่าสุดย้อนกลับไปแล้ว ({latest})")
+    name = latest
+    rows = [(int(r[0]), r[1], r[2], r[3]) for r in pool.ws_call(name, "get_all_values")[1:] if r and r[0].isdigit()]
+    current = _current(sheet)
+    todo = [c for c in rows if current.get(c[0]) == (c[1].strip(), c[3])]
+    _write_class(sheet, [(row, old) for row, _, old, _ in todo])
+    done = f"{ROLLEDBACK_PREFIX}{name[len(SNAPSHOT_PREFIX):]}"
+    pool.ws_call(name, "update_title", done)
+    return todo, done
@@ -0,0 +1,212 @@
+# ✅ Roster store กลางของทั้ง process (แทน st.session_state['df_tra'] ของแต่ละ session)
+# - อ่านทั้งชีตครั้งเดียวต่อ TTL แล้วทุก session ใช้ข้อมูลชุดเดียวกัน
+# - version เพิ่มขึ้นทุกครั้งที่ข้อมูลเปลี่ยน (โหลดใหม่ / แก้ไข / เพิ่มแถว) ใช้เป็น key ของ cache อื่นๆ ได้
+# - การเขียนจากแอปนี้ patch แถวใน cache ตรงๆ ไม่ต้องโหลดชีตใหม่ทั้งหมด
+# - index_version เพิ่มเฉพาะเมื่อ ชื่อ/รหัส/ทะเบียน เปลี่ยน (ใช้กับ search index ไม่ต้องสร้างใหม่ทุกครั้งที่หักแต้ม)
+# - index รหัสนักเรียน -> แถว และ ทะเบียน (normalize แล้ว) -> แถว ใช้แทน sheet.find / การกรอง DataFrame
+#   (รหัสซ้ำได้: ระบบเดิมไม่กันการลงทะเบียนซ้ำ จึงเก็บทุกแถวของรหัสนั้นเรียงตามเลขแถว)
+# หมายเหตุ: เลขแถว (row) ในไฟล์นี้คือเลขแถวจริงในชีต (แถว 1 = header, นักเรียนคนแรก = แถว 2)
+import re
+import threading
+from bisect import insort
+import time
+import unicodedata
+
+MIN_COLS = 16  # A..P ตามที่หน้าลงทะเบียนบันทึก
+COL_NAME, COL_ID, COL_PLATE = 1, 2, 6
+COL_PIN = 15
+KEY_COLS = {COL_NAME, COL_ID, COL_PLATE}
+
+
+def col_name(i):
+    return f"C{i}"
+
+
+def norm_id(sid):
+    return str(sid).strip()
+
+
+TITLES = ("นางสาว", "เด็กชาย", "เด็กหญิง", "นาย", "นาง", "ครู", "ด.ช.", "ด.ญ.", "น.ส.")
+PUNCT = re.compile(r'[\s\-./]+')
+THAI_MARK = re.compile(r'[\u0E30-\u0E4E]')  # สระ/วรรณยุกต์ (ตัวอักษรบนป้ายทะเบียนเป็นพยัญชนะล้วน)
+PLATE_CORE = re.compile(r'^(\d{0,2}[\u0E01-\u0E2E]{1,3}\d{1,4})[\u0E01-\u0E4E]+$')
+
+
+def norm_text(text):
+    # ตัดช่องว่าง/ขีด/จุด + แก้ "ํา" ที่พิมพ์แยกตัว ให้เป็น "ำ"
+    text = str(text)
+    if not text.isascii(): text = unicodedata.normalize("NFC", text).replace("\u0e4d\u0e32", "\u0e33")
+    return PUNCT.sub('', text).lower()
+
+
+def norm_plate(plate):
+    # ตัดชื่อจังหวัดทิ้ง เช่น "1กข - 234 จันทบุรี" / "กขค จันทบุรี 123" -> "1กข234" / "กขค123"
+    tokens = [t for t in PUNCT.split(str(plate)) if t]
+    core = [t for t in tokens if not THAI_MARK.search(t)]
+    key = norm_text("".join(core or tokens))
+    m = PLATE_CORE.match(key)
+    return m.group(1) if m else key
+
+
+TITLE_KEYS = tuple(norm_text(t) for t in TITLES)
+
+
+def norm_name(name):
+    key = norm_text(name)
+    for t in TITLE_KEYS:
+        if key.startswith(t) and len(key) > len(t): return key[len(t):]
+    return key
+
+
+class RosterStore:
+    def __init__(self, sheet, ttl=60):
+        self.sheet = sheet
+        self.ttl = ttl
+        self.version = 0
+        self.index_version = 0
+        self.loaded_at = 0.0
+        self._header = None
+        self._rows = None
+        self._df = None
+        self._by_id = {}
+        self._by_plate = {}
+        self.before_refresh = None  # เรียกก่อนโหลดชีตใหม่ (เช่น flush คิวเขียนที่ค้างอยู่)
+        self.lock = threading.RLock()  # ผู้เขียนถือ lock นี้ได้ระหว่าง อ่าน-คำนวณ-patch แถวเดียวกัน
+
+    # --- โหลด ---
+    def _width(self, header):
+        return max(MIN_COLS, len(header))
+
+    def _pad(self, row, width):
+        row = [str(x) for x in row[:width]]
+        return row + [""] * (width - len(row))
+
+    def is_stale(self):
+        return self._rows is None or (time.time() - self.loaded_at) > self.ttl
+
+    def refresh(self, force=False):
+        # อย่าเรียกขณะถือ self.lock (before_refresh อาจรอ lock ของคิวเขียน)
+        if not force and not self.is_stale(): return
+        if self.before_refresh: self.before_refresh()
+        with self.lock:
+            if not force and not self.is_stale(): return
+            vals = self.sheet.get_all_values()
+            header = vals[0] if vals else []
+            width = self._width(header)
+            self._header = self._pad(header, width)
+            self._rows = [self._pad(r, width) for r in vals[1:]]
+            self._df = None
+            self._build_index()
+            self.loaded_at = time.time()
+            self.version += 1
+            self.index_version += 1
+
+    # --- index ---
+    def _build_index(self):
+        self._by_id, self._by_plate = {}, {}
+        for i, r in enumerate(self._rows): self._index_row(i + 2, r)
+
+    def _index_row(self, row, r):
+        sid, plate = norm_id(r[COL_ID]), norm_plate(r[COL_PLATE])
+        if sid: insort(self._by_id.setdefault(sid, []), row)
+        if plate: self._by_plate.setdefault(plate, []).append(row)
+
+    def _unindex_row(self, row, r):
+        sid, plate = norm_id(r[COL_ID]), norm_plate(r[COL_PLATE])
+        rows = self._by_id.get(sid)
+        if rows and row in rows:
+            rows.remove(row)
+            if not rows: del self._by_id[sid]
+        rows = self._by_plate.get(plate)
+        if rows and row in rows:
+            rows.remove(row)
+            if not rows: del self._by_plate[plate]
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = 0.0
+
+    # --- อ่าน ---
+    def rows(self):
+        self.refresh()
+        with self.lock:
+            return self._rows
+
+    def df(self):
+        # DataFrame คอลัมน์ C0..Cn แบบเดียวกับ df_tra เดิม (สร้างใหม่เฉพาะเมื่อโหลดชีตใหม่)
+        self.refresh()
+        with self.lock:
+            if self._df is None:
+                import pandas as pd  # import ตอนใช้ครั้งแรก (หน้าลงทะเบียนใช้แค่ index ไม่ต้องโหลด pandas)
+                self._df = pd.DataFrame(self._rows, columns=[col_name(i) for i in range(len(self._header))])
+            return self._df
+
+    def get_row(self, row, refresh=True):
+        if refresh: self.refresh()
+        with self.lock:
+            rows = self._rows; i = row - 2
+            return list(rows[i]) if 0 <= i < len(rows) else None
+
+    def row_of(self, sid):
+        # เลขแถวแรกของรหัสนักเรียน (None = ไม่พบ)
+        self.refresh()
+        with self.lock:
+            rows = self._by_id.get(norm_id(sid))
+            return rows[0] if rows else None
+
+    def rows_of_id(self, sid):
+        self.refresh()
+        with self.lock:
+            return list(self._by_id.get(norm_id(sid), []))
+
+    def rows_of_plate(self, plate):
+        self.refresh()
+        with self.lock:
+            return list(self._by_plate.get(norm_plate(plate), []))
+
+    def find(self, sid, pin=None):
+        # (เลขแถว, ข้อมูลแถว) ของรหัสนักเรียน ; ให้ pin มา = เลือกแถวที่ PIN ตรง (รหัสซ้ำหลายแถว)
+        self.refresh()
+        with self.lock:
+            rows = self._by_id.get(norm_id(sid), [])
+            if pin is not None: rows = [r for r in rows if self._rows[r - 2][COL_PIN] == str(pin)]
+            return (rows[0], list(self._rows[rows[0] - 2])) if rows else (None, None)
+
+    # --- เขียน (เรียกหลังเขียนลงชีตสำเร็จแล้ว) ---
+    def patch(self, row, start_col, values):
+        # start_col นับจาก 0 (A = 0) ; values = ค่าของคอลัมน์ต่อเนื่องกันในแถวเดียว
+        with self.lock:
+            if self._rows is None: return
+            i = row - 2
+            if not 0 <= i < len(self._rows): self.invalidate(); return
+            r = self._rows[i]
+            self._unindex_row(row, r)
+            for k, val in enumerate(values):
+                c = start_col + k
+                if c >= len(r): continue
+                r[c] = str(val)
+                if self._df is not None: self._df.iat[i, c] = str(val)
+            self._index_row(row, r)
+            self.version += 1
+            if KEY_COLS.intersection(range(start_col, start_col + len(values))): self.index_version += 1
+
+    def append(self, values, res=None):
+        # res = ผลลัพธ์จาก sheet.append_row ใช้ตรวจว่าแถวใหม่อยู่ตรงกับ cache หรือไม่
+        with self.lock:
+            if self._rows is None: return
+            row = len(self._rows) + 2
+            got = appended_row(res)
+            if got is not None and got != row: self.invalidate(); return
+            self._rows.append(self._pad(values, len(self._header)))
+            self._index_row(row, self._rows[-1])
+            self._df = None
+            self.version += 1
+            self.index_version += 1
+
+
+def appended_row(res):
+    # ดึงเลขแถวจาก updates.updatedRange เช่น "Sheet1!A12:P12"
+    try: rng = res["updates"]["updatedRange"]
+    except (TypeError, KeyError): return None
+    m = re.search(r'![A-Z]+(\d+)', rng)
+    return int(m.group(1)) if m else None
@@ -0,0 +1,185 @@
+# ✅ ประวัติแต้มแบบตาราง event (ชีต score_events) แทนการต่อข้อความในคอลัมน์ M ไปเรื่อยๆ
+# - 1 แถว = 1 รายการ: รหัส, เวลา, ส่วนต่างที่เกิดจริง, แต้มที่สั่ง, เจ้าหน้าที่, เหตุผล, ที่มา, id
+# - id สุ่มครั้งเดียวตอนสร้างรายการ: append ที่ timeout (อาจลงชีตไปแล้ว) ส่งซ้ำได้โดยเช็ก id ก่อน
+#   และตอนโหลดตัดรายการที่ id ซ้ำทิ้ง (แถวเก่าที่ไม่มี id ไม่ถูกตัด)
+# - เพิ่มรายการแบบ append_rows ทีละชุด (ผ่าน WriteQueue) ไม่ต้องเขียนทับข้อความเก่า
+# - โหลดเป็น DataFrame ครั้งเดียวต่อ TTL ; แต้มปัจจุบัน = 100 + ผลรวม delta ของรหัสนั้น
+#   (delta เป็นส่วนต่างหลังจำกัด 0-100 แล้ว จึงรวมแบบ vectorized ได้ตรง)
+# - migrate_legacy: แปลงข้อความเก่าในคอลัมน์ M เป็น event (ครั้งเดียว) ; ข้อความที่แปลงไม่ได้เก็บเป็นรายการ note
+# - backup_legacy: เก็บข้อความเดิมไว้ในชีต m_backup_<วันเวลา> ก่อนล้างคอลัมน์ M
+# - ทุกคำสั่งกับชีตผ่าน pool (ws_call / book_call) จึงได้ retry + backoff เหมือนชีตหลัก
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import gspread
+import pandas as pd
+import pytz
+
+thai_tz = pytz.timezone('Asia/Bangkok')
+EVENTS_SHEET = "score_events"
+COLUMNS = ["sid", "ts", "delta", "points", "officer", "reason", "source", "id"]
+COL_EVENT_ID = COLUMNS.index("id")
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+BASE_SCORE = 100
+BACKUP_PREFIX = "m_backup_"
+LEGACY_LINE = re.compile(r'^\[(\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2})\]\s*(หัก|เพิ่ม)\s*(\d+)\s*โดย\s*(.*?):\s?(.*)$')
+
+
+def now_ts():
+    return datetime.now(thai_tz).strftime(TS_FMT)
+
+
+def make_event(sid, delta, points, officer, reason, ts=None, source="app"):
+    # ts=None = ตอนนี้ ; ts="" = ไม่ทราบเวลา (ข้อความเก่า) แสดงก่อนรายการที่มีเวลา
+    return [str(sid), ts if ts is not None else now_ts(), str(int(delta)), str(int(points)), officer, reason, source, uuid.uuid4().hex[:16]]
+
+
+def make_note(sid, text):
+    # ข้อความเก่าที่ไม่ใช่รูปแบบ "[เวลา] หัก/เพิ่ม ..." : เก็บไว้ทั้งหมด ไม่มีผลกับแต้ม (แต้ม 0 + ไม่มีเจ้าหน้าที่)
+    return make_event(sid, 0, 0, "", text, "", "migrated")
+
+
+def is_note(points, officer):
+    return int(points) == 0 and not officer
+
+
+def format_history(events):
+    # events = DataFrame ของรหัสเดียว -> ข้อความสำหรับ PDF (รูปแบบเดียวกับบรรทัดในคอลัมน์ M เดิม)
+    # เรียงตามเวลา (stable: เวลาเท่ากันคงลำดับในชีต) ; รายการที่ไม่มีเวลา (note) ขึ้นก่อน
+    lines = []
+    events = events.sort_values("ts", kind="stable")
+    for ts, pts, officer, reason in events[["ts", "points", "officer", "reason"]].itertuples(index=False):
+        try: ts = datetime.strptime(ts, TS_FMT).strftime('%d/%m/%Y %H:%M')
+        except ValueError: pass
+        if is_note(pts, officer): lines.append(reason); continue
+        pts = int(pts)
+        lines.append(f"{f'[{ts}] ' if ts else ''}{'หัก' if pts < 0 else 'เพิ่ม'} {abs(pts)} โดย {officer}: {reason}")
+    return "\n".join(lines)
+
+
+def parse_legacy(sid, text, score):
+    # แปลงข้อความคอลัมน์ M -> event ; คำนวณ delta จริงโดยไล่จำกัด 0-100 ตามลำดับ
+    # ถ้าผลรวมไม่ตรงกับแต้มในคอลัมน์ N (มีคนแก้มือ) เพิ่มรายการปรับยอดให้ตรง
+    events, cur, last_ts = [], BASE_SCORE, ""
+    for line in str(text).split("\n"):
+        m = LEGACY_LINE.match(line.strip())
+        if not m:
+            if not line.strip(): continue
+            if not events: events.append(make_note(sid, line.strip()))  # ข้อความก่อนรายการแรก
+            else: events[-1][5] += "\n" + line.strip()  # เหตุผลหลายบรรทัด
+            continue
+        ts, op, pts, officer, reason = m.groups()
+        try: ts = datetime.strptime(ts, '%d/%m/%Y %H:%M').strftime(TS_FMT)
+        except ValueError: pass
+        pts = int(pts) * (-1 if op == "หัก" else 1)
+        new = max(0, min(BASE_SCORE, cur + pts))
+        events.append(make_event(sid, new - cur, pts, officer, reason, ts, "migrated")); cur, last_ts = new, ts
+    # รายการปรับยอดใช้เวลาของรายการเก่าล่าสุด (ไม่ใช่เวลาที่ migrate) จะได้อยู่ต่อท้ายประวัติเก่า
+    if score != cur: events.append(make_event(sid, score - cur, score - cur, "system", "ปรับยอดให้ตรงกับแต้มในชีต", last_ts, "migrated"))
+    return events
+
+
+class EventLog:
+    def __init__(self, pool, ttl=60, title=EVENTS_SHEET):
+        self.pool = pool
+        self.ttl = ttl
+        self.title = title
+        self.version = 0
+        self.loaded_at = 0.0
+        self._df = None
+        self._groups = None
+        self.lock = threading.RLock()
+
+    def _call(self, method, *args, **kwargs):
+        # คำสั่งกับชีต score_events ผ่าน pool ; ยังไม่มีชีต -> สร้าง + header ก่อน (ครั้งแรกครั้งเดียว)
+        try: return self.pool.ws_call(self.title, method, *args, **kwargs)
+        except gspread.exceptions.WorksheetNotFound: pass
+        with self.lock:  # เธรดอื่นอาจสร้างไปแล้วระหว่างรอ lock
+            if self.title not in [ws.title for ws in self.pool.book_call("worksheets")]:
+                self.pool.book_call("add_worksheet", title=self.title, rows=1000, cols=len(COLUMNS))
+                self.pool.ws_call(self.title, "update", range_name="A1", values=[COLUMNS])
+        return self.pool.ws_call(self.title, method, *args, **kwargs)
+
+    # --- โหลด ---
+    def refresh(self, force=False):
+        with self.lock:
+            if not force and self._df is not None and time.time() - self.loaded_at <= self.ttl: return
+            vals = self._call("get_all_values")
+            if vals and vals[0][:len(COLUMNS)] != COLUMNS: self._call("update", range_name="A1", values=[COLUMNS])  # ชีตรุ่นก่อนไม่มีคอลัมน์ id
+            self._set(pd.DataFrame([(r + [""] * len(COLUMNS))[:len(COLUMNS)] for r in vals[1:]], columns=COLUMNS))
+            self.loaded_at = time.time()
+
+    def _set(self, df):
+        df = df[~(df["id"].ne("") & df["id"].duplicated())].reset_index(drop=True)
+        df["delta"] = pd.to_numeric(df["delta"], errors="coerce").fillna(0).astype(int)
+        df["points"] = pd.to_numeric(df["points"], errors="coerce").fillna(0).astype(int)
+        self._df, self._groups = df, None
+        self.version += 1
+
+    def df(self):
+        self.refresh()
+        with self.lock: return self._df
+
+    def for_student(self, sid):
+        self.refresh()
+        with self.lock:
+            if self._groups is None: self._groups = self._df.groupby("sid").indices
+            idx = self._groups.get(str(sid))
+            return self._df.iloc[idx] if idx is not None else self._df.iloc[0:0]
+
+    def scores(self):
+        # แต้มที่คำนวณจาก event (Series: รหัส -> แต้ม) เฉพาะรหัสที่มี event
+        return BASE_SCORE + self.df().groupby("sid")["delta"].sum()
+
+    # --- เขียน ---
+    def append(self, events, chunk=5000, check=False):
+        # check=True: ส่งซ้ำหลังครั้งก่อนล้ม -> ข้ามรายการที่ id อยู่ในชีตแล้ว (ครั้งก่อนอาจลงไปแล้วก่อน timeout)
+        if not events: return
+        todo = events
+        if check:
+            have = set(self._call("col_values", COL_EVENT_ID + 1))
+            todo = [e for e in events if e[COL_EVENT_ID] not in have]
+        for k in range(0, len(todo), chunk):
+            self._call("append_rows", todo[k:k + chunk], value_input_option="RAW")
+        with self.lock:
+            if self._df is not None:
+                self._set(pd.concat([self._df, pd.DataFrame(events, columns=COLUMNS)], ignore_index=True))
+
+
+def check_scores(events, rows):
+    # เทียบแต้มคอลัมน์ N กับผลรวม event ; คืน DataFrame เฉพาะรหัสที่ไม่ตรง (รหัสที่ยังไม่มี event ถือว่า 100)
+    roster = pd.DataFrame([(r[2], r[1], r[13]) for r in rows], columns=["sid", "name", "sheet"])
+    roster["sheet"] = pd.to_numeric(roster["sheet"], errors="coerce").fillna(BASE_SCORE).astype(int)
+    roster["events"] = roster["sid"].map(events.scores()).fillna(BASE_SCORE).astype(int)
+    return roster[roster["sheet"] != roster["events"]]
+
+
+def migrate_legacy(events, rows, col_log=12, col_score=13):
+    # คืน (event ทั้งหมด, แถวที่ต้องล้างคอลัมน์ M) ; ข้ามรหัสที่เคย migrate ไปแล้ว
+    # แต้มในคอลัมน์ N รวมรายการใหม่ (source=app) ไว้แล้ว จึงหักออกก่อนเทียบกับข้อความเก่า
+    df = events.df()
+    done = set(df.loc[df["source"] == "migrated", "sid"])
+    app_sum = df[df["source"] != "migrated"].groupby("sid")["delta"].sum()
+    out, rows_done = [], []
+    for i, r in enumerate(rows):
+        sid, text = str(r[2]).strip(), str(r[col_log])
+        if not sid or sid in done: continue
+        text = "" if text.lower() == "nan" else text
+        score = (int(r[col_score]) if str(r[col_score]).isdigit() else BASE_SCORE) - int(app_sum.get(sid, 0))
+        if not text.strip() and score == BASE_SCORE: continue
+        out += parse_legacy(sid, text, score)
+        if text.strip(): rows_done.append(i + 2)
+    return out, rows_done
+
+
+def backup_legacy(pool, rows, rows_done, col_log=12):
+    # เก็บข้อความเดิมของแถวที่จะล้างคอลัมน์ M ไว้ในชีตใหม่ (เหมือน snapshot ของการเลื่อนชั้น) ; คืนชื่อชีต
+    if not rows_done: return None
+    name = f"{BACKUP_PREFIX}{datetime.now(thai_tz).strftime('%Y%m%d_%H%M%S')}"
+    pool.book_call("add_worksheet", title=name, rows=len(rows_done) + 1, cols=3)
+    vals = [["แถว", "รหัส", "ประวัติเดิม"]] + [[str(row), rows[row - 2][2], rows[row - 2][col_log]] for row in rows_done]
+    pool.ws_call(name, "update", range_name="A1", values=vals, value_input_option="RAW")
+    return name
@@ -0,0 +1,63 @@
+# ✅ Search index สำหรับช่องค้นหาของเจ้าหน้าที่ (แทน str.contains 3 รอบทุก rerun)
+# - สร้างครั้งเดียวต่อ roster.index_version จากคีย์ที่ normalize แล้ว (รหัส / ทะเบียนไม่มีจังหวัด / ชื่อไม่มีคำนำหน้า)
+# - ตรงทั้งคำ / ขึ้นต้น: bisect บน array คีย์ที่เรียงไว้
+# - มีอยู่ในคำ: str.find บนสตริงคีย์ทั้งหมดที่ต่อกัน (สแกนระดับ C) แล้ว bisect หาแถว
+# - ไม่ใช้ regex กับคำค้น จึงพิมพ์ ( หรือ * ได้ไม่ error
+# ผลลัพธ์เป็น index ของแถวใน roster.rows() (เลขแถวในชีต = index + 2)
+import re
+from bisect import bisect_left, bisect_right
+
+from roster import COL_ID, COL_NAME, COL_PLATE, norm_name, norm_plate, norm_text
+
+EXACT, PREFIX, SUBSTR = 0, 1, 2
+FIELDS = ((COL_ID, norm_text), (COL_PLATE, norm_plate), (COL_NAME, norm_name))  # ลำดับ = ความสำคัญตอนจัดอันดับ
+SEP = "\x00"
+
+
+class SearchIndex:
+    def __init__(self, rows):
+        entries = []  # (คีย์, ลำดับฟิลด์, index แถว)
+        for i, r in enumerate(rows):
+            for f, (col, norm) in enumerate(FIELDS):
+                key = norm(r[col])
+                if key: entries.append((key, f, i))
+        self.size = len(rows)
+        self._sorted = sorted(entries)
+        self._keys = [e[0] for e in self._sorted]
+        self._entries = entries
+        self._starts, pos = [], 0
+        for key, _, _ in entries:
+            self._starts.append(pos); pos += len(key) + 1
+        self._hay = SEP.join(e[0] for e in entries)
+
+    def _variants(self, q):
+        return {k for k in (norm_text(q), norm_name(q), norm_plate(q)) if k and SEP not in k}
+
+    def search(self, q, limit=30):
+        best = {}  # index แถว -> (อันดับ, ฟิลด์)
+        def hit(i, rank, f):
+            if i not in best or (rank, f) < best[i]: best[i] = (rank, f)
+        for qk in self._variants(q):
+            # ขึ้นต้นด้วย / ตรงทั้งคำ (คีย์ที่ตรงทั้งคำจะเรียงมาก่อนเสมอ)
+            lo = bisect_left(self._keys, qk)
+            for key, f, i in self._sorted[lo:lo + limit * 4]:
+                if not key.startswith(qk): break
+                hit(i, EXACT if key == qk else PREFIX, f)
+            # มีอยู่ในคำ
+            pos, found = self._hay.find(qk), 0
+            while pos != -1 and found < limit * 4:
+                n = bisect_right(self._starts, pos) - 1
+                key, f, i = self._entries[n]
+                if pos > self._starts[n]: hit(i, SUBSTR, f)
+                pos, found = self._hay.find(qk, pos + 1), found + 1
+        return sorted(best, key=lambda i: (best[i], i))[:limit]
+
+    def resolve_plates(self, text, by_plate):
+        # โหมดหน้าประตู: วางทะเบียนหลายคัน (ขึ้นบรรทัดใหม่ หรือคั่นด้วย , ;) แล้วหาทีเดียว
+        # by_plate = roster.rows_of_plate ; คืน [(ทะเบียนที่พิมพ์, [index แถว])]
+        out = []
+        for p in (x.strip() for x in re.split(r'[\n,;]+', text)):
+            if not p: continue
+            rows = [r - 2 for r in by_plate(p)] or self.search(p, limit=3)
+            out.append((p, rows))
+        return out
@@ -0,0 +1,126 @@
+# ✅ Pool เชื่อมต่อ Google Sheets แบบใช้ร่วมกันทั้ง process
+# - authorize ครั้งเดียว แล้วใช้ client เดิมทุก rerun / ทุก session
+# - token หมดอายุ: google-auth (AuthorizedSession ใน gspread) refresh ให้เองอัตโนมัติ
+# - หลัง open ด้วยชื่อครั้งแรก จะจำ spreadsheet key ไว้ ครั้งต่อไปใช้ open_by_key (ไม่ต้องค้นใน Drive)
+# - error ด้าน auth / network: ทิ้ง client แล้วเชื่อมต่อใหม่แบบ backoff
+import random
+import threading
+import time
+
+import gspread
+import requests
+from google.auth.exceptions import RefreshError, TransportError
+from oauth2client.service_account import ServiceAccountCredentials
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# รหัส error จาก API ที่ลองใหม่ได้ (401 = token เสีย ต้องต่อใหม่, ที่เหลือเป็นปัญหาชั่วคราว)
+RETRY_CODES = {401, 408, 429, 500, 502, 503, 504}
+RECONNECT_CODES = {401}
+# คำสั่งที่ส่งซ้ำแล้วได้ผลซ้ำ (เพิ่มแถว / เพิ่มชีต): ลองใหม่เฉพาะ error ที่แน่ใจว่าคำสั่งยังไม่ถูกทำ
+# (timeout / 5xx / network อาจทำไปแล้วฝั่ง server ส่งซ้ำจะได้แถวซ้ำ)
+APPEND_METHODS = {"append_row", "append_rows", "add_worksheet"}
+APPEND_RETRY_CODES = {401, 429}
+NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TransportError, RefreshError)
+
+
+class SheetPool:
+    def __init__(self, key_dict, sheet_name, retries=4, backoff=0.5, max_backoff=8.0):
+        self.key_dict = key_dict
+        self.sheet_name = sheet_name
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sheet_key = None
+        self._client = None
+        self._ws = None
+        self._tabs = {}  # ชื่อชีตอื่นในไฟล์ -> worksheet (ของ client ปัจจุบัน)
+        self._lock = threading.RLock()
+        self.on_call = None      # on_call(method, วินาที, สำเร็จไหม) ทุกครั้งที่เรียกผ่าน pool (ใช้วัดผล)
+        self.on_response = None  # requests response hook ติดกับ session ของ client ทุกครั้งที่เชื่อมต่อ
+
+    def _connect(self):
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(self.key_dict, SCOPE)
+        client = gspread.authorize(creds)
+        if self.on_response: client.http_client.session.hooks["response"].append(self.on_response)
+        sh = client.open_by_key(self.sheet_key) if self.sheet_key else client.open(self.sheet_name)
+        self.sheet_key = sh.id
+        self._client, self._ws = client, sh.sheet1
+
+    def _wait(self, attempt):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(delay + random.uniform(0, self.backoff))
+
+    def _should_retry(self, e, method=None):
+        if method in APPEND_METHODS:
+            if isinstance(e, gspread.exceptions.APIError): return e.code in APPEND_RETRY_CODES, e.code in RECONNECT_CODES
+            return False, False
+        if isinstance(e, NETWORK_ERRORS): return True, True
+        if isinstance(e, gspread.exceptions.APIError):
+            return e.code in RETRY_CODES, e.code in RECONNECT_CODES
+        return False, False
+
+    def reset(self):
+        with self._lock:
+            self._client, self._ws = None, None
+            self._tabs = {}
+
+    def worksheet(self):
+        with self._lock:
+            if self._ws is not None: return self._ws
+            for attempt in range(self.retries):
+                try:
+                    self._connect(); return self._ws
+                except Exception as e:
+                    retry, _ = self._should_retry(e)
+                    if not retry or attempt == self.retries - 1: raise
+                    self._wait(attempt)
+
+    def call(self, method, *args, **kwargs):
+        # เรียก worksheet.<method>(...) พร้อมลองใหม่เมื่อเจอ error ชั่วคราว
+        return self._call(lambda ws: ws, method, *args, **kwargs)
+
+    def book_call(self, method, *args, **kwargs):
+        # เหมือน call แต่เรียกที่ระดับไฟล์ (spreadsheet) เช่น add_worksheet / worksheets
+        return self._call(lambda ws: ws.spreadsheet, method, *args, **kwargs)
+
+    def ws_call(self, title, method, *args, **kwargs):
+        # เหมือน call แต่เรียกที่ชีตอื่นในไฟล์เดียวกันตามชื่อ (เช่น score_events / snapshot เลื่อนชั้น)
+        res = self._call(lambda ws: self._tab(ws, title), method, *args, **kwargs)
+        if method == "update_title":
+            with self._lock: self._tabs.pop(title, None)
+        return res
+
+    def _tab(self, ws, title):
+        with self._lock:
+            tab = self._tabs.get(title)
+            if tab is None: tab = self._tabs[title] = ws.spreadsheet.worksheet(title)
+            return tab
+
+    def _call(self, target, method, *args, **kwargs):
+        for attempt in range(self.retries):
+            ws = self.worksheet()
+            t = time.perf_counter()
+            try:
+                res = getattr(target(ws), method)(*args, **kwargs)
+                if self.on_call: self.on_call(method, time.perf_counter() - t, True)
+                return res
+            except Exception as e:
+                if self.on_call: self.on_call(method, time.perf_counter() - t, False)
+                retry, reconnect = self._should_retry(e, method)
+                if not retry or attempt == self.retries - 1: raise
+                if reconnect: self.reset()
+                self._wait(attempt)
+
+    @property
+    def sheet(self):
+        return PooledSheet(self)
+
+
+class PooledSheet:
+    # ใช้แทน worksheet ได้ตรงๆ (sheet.find / sheet.update ...) แต่ทุกคำสั่งวิ่งผ่าน pool.call
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self._pool.call(name, *args, **kwargs)
@@ -0,0 +1,6 @@
+# รันจากโฟลเดอร์ไหนก็ได้: ให้ import โมดูลของแอป (โฟลเดอร์หลัก) ได้
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
@@ -0,0 +1,49 @@
+# อัปโหลดรูปผ่าน GAS: ลองใหม่เฉพาะเมื่อแน่ใจว่ายังไม่ได้สร้างไฟล์
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError
+
+import photo_upload
+
+
+class Session:
+    def __init__(self, *answers):
+        self.answers, self.posts = list(answers), 0
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        self.posts += 1; ans = self.answers.pop(0)
+        if isinstance(ans, Exception): raise ans
+        return type("Res", (), {"json": lambda self: ans})()
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(photo_upload.time, "sleep", lambda s: None)
+
+
+def upload(session, monkeypatch):
+    monkeypatch.setattr(photo_upload, "_session", session)
+    return photo_upload.upload_photo("https://gas", "folder", b"jpeg", "a.jpg")
+
+
+OK = {"status": "success", "link": "https://drive/x"}
+
+
+def test_read_timeout_not_retried(monkeypatch):
+    s = Session(requests.exceptions.ReadTimeout("slow"), OK)
+    assert upload(s, monkeypatch) is None and s.posts == 1
+
+
+def test_connection_reset_not_retried(monkeypatch):
+    s = Session(requests.exceptions.ConnectionError(ConnectionResetError()), OK)
+    assert upload(s, monkeypatch) is None and s.posts == 1
+
+
+def test_connect_error_retried(monkeypatch):
+    s = Session(requests.exceptions.ConnectionError(MaxRetryError(None, "https://gas")), requests.exceptions.ConnectTimeout(), OK)
+    assert upload(s, monkeypatch) == "https://drive/x" and s.posts == 3
+
+
+def test_error_status_retried(monkeypatch):
+    s = Session({"status": "error", "message": "Service invoked too many times"}, OK)
+    assert upload(s, monkeypatch) == "https://drive/x" and s.posts == 2
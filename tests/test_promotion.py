@@ -0,0 +1,50 @@
+# เลื่อนชั้น / ย้อนกลับ กับชีตปลอมของ bench
+import pytest
+
+from bench.fakes import FakeBook, FakePool, make_rows
+from promotion import apply_promotion, latest_snapshot, plan_promotion, rollback_promotion
+
+
+@pytest.fixture
+def world():
+    book = FakeBook(make_rows(20))
+    pool = FakePool(book, backoff=0)
+    return book, pool, pool.sheet
+
+
+def classes(book):
+    return [r[3] for r in book.sheet1.get_all_values()[1:]]
+
+
+def promote(book, pool, sheet):
+    changes, _ = plan_promotion(book.sheet1.get_all_values()[1:])
+    return apply_promotion(pool, sheet, changes)
+
+
+def test_rollback_only_latest_once(world):
+    book, pool, sheet = world
+    promote(book, pool, sheet); year1 = classes(book)
+    _, name2 = promote(book, pool, sheet)  # วินาทีเดียวกัน -> ชื่อชีตต้องไม่ชนกัน
+    assert name2.endswith("_2")
+    done, snap = rollback_promotion(pool, sheet)
+    assert done and snap == "rolledback_" + name2[len("promote_"):]
+    assert classes(book) == year1
+    assert latest_snapshot(pool) == (snap, True)
+    with pytest.raises(ValueError): rollback_promotion(pool, sheet)  # กดซ้ำไม่ย้อนปีก่อนหน้า
+    assert classes(book) == year1
+
+
+def test_rollback_refuses_other_snapshot(world):
+    book, pool, sheet = world
+    _, name1 = promote(book, pool, sheet)
+    _, name2 = promote(book, pool, sheet)
+    with pytest.raises(ValueError): rollback_promotion(pool, sheet, name1)
+    assert rollback_promotion(pool, sheet, name2)[0]
+
+
+def test_promotion_skips_shifted_rows(world):
+    book, pool, sheet = world
+    changes, _ = plan_promotion(book.sheet1.get_all_values()[1:])
+    del book.sheet1._rows[2]  # มีคนลบแถวระหว่างดูตัวอย่างกับกดยืนยัน
+    done, _ = apply_promotion(pool, sheet, changes)
+    assert [c[0] for c in done] == [2]
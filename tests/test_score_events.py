@@ -0,0 +1,132 @@
+# การย้ายประวัติเก่าจากคอลัมน์ M (parse_legacy / migrate_legacy / backup_legacy) กับชีตปลอมของ bench
+import pytest
+import requests
+
+from bench.fakes import FakeBook, FakePool, make_rows
+from roster import RosterStore
+from score_events import EventLog, backup_legacy, check_scores, format_history, make_event, migrate_legacy, parse_legacy
+from write_queue import WriteQueue
+
+LOG = "[01/06/2026 08:00] หัก 10 โดย ครูเอ: ไม่สวมหมวก\n[02/06/2026 09:30] เพิ่ม 5 โดย ครูบี: จิตอาสา"
+
+
+@pytest.fixture
+def world():
+    book = FakeBook(make_rows(3))
+    pool = FakePool(book, backoff=0)
+    return book, pool, EventLog(pool, ttl=10 ** 9)
+
+
+def deltas(events):
+    return [int(e[2]) for e in events]
+
+
+def test_parse_legacy_lines():
+    ev = parse_legacy("1", LOG, 95)
+    assert deltas(ev) == [-10, 5]
+    assert [e[1] for e in ev] == ["2026-06-01 08:00:00", "2026-06-02 09:30:00"]
+    assert {e[6] for e in ev} == {"migrated"}
+
+
+def test_parse_legacy_clamps_and_adjusts():
+    ev = parse_legacy("1", "[01/06/2026 08:00] เพิ่ม 10 โดย ครูเอ: ดี", 90)
+    assert deltas(ev) == [0, -10]  # เพิ่มเกิน 100 ไม่มีผล ; ยอดไม่ตรงกับคอลัมน์ N -> รายการปรับยอด
+    assert ev[-1][4] == "system"
+
+
+def test_parse_legacy_keeps_unparsed_text():
+    ev = parse_legacy("1", "ย้ายมาจากโรงเรียนเดิม\nเคยโดนตักเตือน\n" + LOG + "\nต่อบรรทัด", 95)
+    assert ev[0][5] == "ย้ายมาจากโรงเรียนเดิม\nเคยโดนตักเตือน"
+    assert deltas(ev) == [0, -10, 5]
+    assert ev[-1][5] == "จิตอาสา\nต่อบรรทัด"
+    assert parse_legacy("1", "ข้อความอิสระ", 100)[0][5] == "ข้อความอิสระ"
+
+
+def test_format_history_notes(world):
+    _, _, log = world
+    log.append(parse_legacy("1", "หมายเหตุเดิม\n" + LOG, 95))
+    assert format_history(log.for_student("1")) == "หมายเหตุเดิม\n[01/06/2026 08:00] หัก 10 โดย ครูเอ: ไม่สวมหมวก\n[02/06/2026 09:30] เพิ่ม 5 โดย ครูบี: จิตอาสา"
+
+
+def test_legacy_times_kept():
+    ev = parse_legacy("1", "หมายเหตุ\n" + LOG, 90)
+    assert [e[1] for e in ev] == ["", "2026-06-01 08:00:00", "2026-06-02 09:30:00", "2026-06-02 09:30:00"]
+    assert parse_legacy("1", "", 90)[0][1] == ""
+
+
+def test_format_history_sorted_by_time(world):
+    # รายการจากแอปที่ลงก่อน migrate ต้องแสดงหลังประวัติเก่าที่เวลาเก่ากว่า
+    _, _, log = world
+    log.append([make_event("1", -5, -5, "ครูซี", "มาสาย", "2026-06-03 10:00:00")])
+    log.append(parse_legacy("1", "หมายเหตุเดิม\n" + LOG, 95))
+    assert format_history(log.for_student("1")).split("\n") == [
+        "หมายเหตุเดิม", "[01/06/2026 08:00] หัก 10 โดย ครูเอ: ไม่สวมหมวก",
+        "[02/06/2026 09:30] เพิ่ม 5 โดย ครูบี: จิตอาสา", "[03/06/2026 10:00] หัก 5 โดย ครูซี: มาสาย"]
+
+
+def test_migrate_legacy(world):
+    _, _, log = world
+    rows = make_rows(3)[1:]
+    rows[0][12], rows[0][13] = LOG, "95"
+    rows[1][12], rows[1][13] = "nan", "80"  # ไม่มีข้อความแต่แต้มไม่เต็ม -> ปรับยอดอย่างเดียว ไม่ล้าง M
+    rows[2][12], rows[2][13] = "", "100"
+    out, done = migrate_legacy(log, rows)
+    assert done == [2]
+    assert [(e[0], int(e[2])) for e in out] == [("10000", -10), ("10000", 5), ("10001", -20)]
+    log.append(out)
+    assert migrate_legacy(log, rows) == ([], [])  # ย้ายแล้วไม่ย้ายซ้ำ
+
+
+def test_migrate_legacy_subtracts_app_events(world):
+    _, _, log = world
+    rows = make_rows(1)[1:]
+    rows[0][12], rows[0][13] = LOG, "90"  # แต้มรวมรายการใหม่จากแอป (-5) แล้ว
+    log.append([make_event("10000", -5, -5, "ครูซี", "มาสาย", "2026-06-03 10:00:00")])
+    out, _ = migrate_legacy(log, rows)
+    assert deltas(out) == [-10, 5]
+
+
+def test_backup_legacy(world):
+    book, pool, _ = world
+    rows = make_rows(3)[1:]
+    rows[1][12] = LOG
+    name = backup_legacy(pool, rows, [3])
+    assert name.startswith("m_backup_")
+    assert book.worksheet(name).get_all_values() == [["แถว", "รหัส", "ประวัติเดิม"], ["3", "10001", LOG]]
+    assert backup_legacy(pool, rows, []) is None
+
+
+def test_event_log_creates_sheet_with_header(world):
+    book, _, log = world
+    log.append([make_event("1", -5, -5, "ครูเอ", "x")])
+    assert book.worksheet("score_events").get_all_values()[0] == ["sid", "ts", "delta", "points", "officer", "reason", "source", "id"]
+    log.refresh(force=True)
+    assert len(log.df()) == 1
+
+
+def test_duplicate_event_ids_dropped_on_load(world):
+    book, _, log = world
+    e = make_event("1", -10, -10, "ครูเอ", "x")
+    log.append([e]); book.worksheet("score_events").append_rows([e])
+    log.refresh(force=True)
+    assert len(log.df()) == 1
+
+
+def test_append_timeout_after_write_not_duplicated(world):
+    # append_rows ลงชีตแล้วแต่ตอบกลับ timeout -> flush รอบหน้าต้องไม่เพิ่มรายการซ้ำ
+    book, pool, log = world
+    book.sheet1._rows[1][13] = "100"
+    roster = RosterStore(pool.sheet, ttl=10 ** 9); roster.refresh(force=True)
+    wq = WriteQueue(pool.sheet, roster, log, flush_sec=10 ** 9, flush_ops=10 ** 9)
+    log.refresh(force=True)
+    ws = book.worksheet("score_events"); orig = ws.append_rows
+    def timeout(values, **kwargs):
+        orig(values, **kwargs); raise requests.exceptions.ReadTimeout("after write")
+    ws.append_rows = timeout
+    wq.adjust_score(2, -10, "ครูเอ", "ไม่สวมหมวก")
+    with pytest.raises(requests.exceptions.ReadTimeout): wq.flush()
+    ws.append_rows = orig
+    wq.flush()
+    assert [r[2] for r in ws.get_all_values()[1:]] == ["-10"]
+    log.refresh(force=True)
+    assert "10000" not in set(check_scores(log, roster.rows())["sid"])
@@ -0,0 +1,86 @@
+# คิวเขียน (WriteQueue) กับชีตปลอมของ bench: replay หลัง batch_update ล้ม, แถวเลื่อน, รหัสซ้ำ, แก้แต้มจากนอกแอป
+import pytest
+import requests
+
+from bench.fakes import FakeBook, FakePool, make_rows
+from roster import RosterStore
+from score_events import EventLog
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def world():
+    rows = make_rows(5)
+    for r in rows[1:]: r[13] = "100"
+    book = FakeBook(rows)
+    pool = FakePool(book, backoff=0)
+    roster = RosterStore(pool.sheet, ttl=10 ** 9); roster.refresh(force=True)
+    log = EventLog(pool, ttl=10 ** 9)
+    wq = WriteQueue(pool.sheet, roster, log, flush_sec=10 ** 9, flush_ops=10 ** 9)
+    return book.sheet1, roster, log, wq
+
+
+def cell(ws, row, col):
+    return ws.get_all_values()[row - 1][col]
+
+
+def event_deltas(log):
+    log.refresh(force=True)
+    return log.df()[["sid", "delta"]].values.tolist()
+
+
+@pytest.mark.parametrize("applied", [True, False])
+def test_batch_update_failure_replayed_once(world, applied):
+    # timeout หลังชีตบันทึกแล้ว (applied) หรือก่อนบันทึก -> flush รอบหน้าได้ผลเท่ากับหักครั้งเดียว
+    ws, roster, log, wq = world
+    orig = ws.batch_update
+    def fail(data, **kwargs):
+        if applied: orig(data, **kwargs)
+        raise requests.exceptions.ReadTimeout("timeout")
+    ws.batch_update = fail
+    wq.adjust_score(2, -10, "ครูเอ", "ไม่สวมหมวก")
+    with pytest.raises(requests.exceptions.ReadTimeout): wq.flush()
+    assert wq.pending() == 1
+    ws.batch_update = orig
+    wq.flush()
+    assert cell(ws, 2, 13) == "90" and roster.get_row(2)[13] == "90"
+    assert event_deltas(log) == [["10000", -10]]
+    assert wq.pending() == 0
+
+
+def test_shifted_row_written_to_new_row(world):
+    ws, roster, log, wq = world
+    wq.adjust_score(4, -5, "ครูเอ", "x")
+    wq.set_cells(4, 5, ["แดง"])
+    del ws._rows[2]  # มีคนลบแถว 3 ในชีต -> รหัส 10002 เลื่อนขึ้นไปแถว 3
+    wq.flush()
+    assert cell(ws, 4, 2) == "10003" and cell(ws, 4, 13) == "100"  # แถวเดิมของคิวเป็นของคนอื่นแล้ว ไม่ถูกเขียน
+    wq.flush()
+    assert cell(ws, 3, 2) == "10002" and cell(ws, 3, 13) == "95" and cell(ws, 3, 5) == "แดง"
+    assert roster.get_row(3)[13] == "95"
+    assert event_deltas(log) == [["10002", -5]]
+    assert wq.pending() == 0 and not wq.conflicts
+
+
+def test_duplicated_id_goes_to_conflicts(world):
+    ws, roster, log, wq = world
+    wq.adjust_score(4, -5, "ครูเอ", "x")
+    ws._rows.insert(1, list(ws._rows[3]))  # แทรกแถวซ้ำของ 10002 ไว้บนสุด -> แถวเลื่อน + รหัสซ้ำ
+    wq.flush(); wq.flush()
+    assert [(sid, row, [op[1] for op in ops]) for sid, row, _, ops in wq.conflicts] == [("10002", 4, [-5])]
+    assert [r[13] for r in ws.get_all_values()[1:] if r[2] == "10002"] == ["100", "100"]
+    assert event_deltas(log) == []
+    assert wq.pending() == 1
+    wq.drop_conflicts()
+    assert wq.pending() == 0
+
+
+def test_merge_with_outside_edit(world):
+    # มีคนแก้แต้มในชีตตรงๆ (roster ยังไม่เห็น) -> หักต่อจากค่าในชีต ไม่เขียนทับ
+    ws, roster, log, wq = world
+    wq.adjust_score(2, -10, "ครูเอ", "x")
+    ws._rows[1][13] = "70"
+    wq.adjust_score(2, -5, "ครูบี", "y")
+    wq.flush()
+    assert cell(ws, 2, 13) == "55" and roster.get_row(2)[13] == "55"
+    assert event_deltas(log) == [["10000", -10], ["10000", -5]]
@@ -0,0 +1,186 @@
+# ✅ Cache รูป thumbnail จาก Google Drive (ใช้ร่วมกันทั้ง process)
+# - key = Drive file id ; โหลดจาก Drive ครั้งเดียวแล้วย่อเป็นทุกขนาดที่ UI/PDF ใช้ (SIZES) เก็บไว้
+# - LRU ในหน่วยความจำ จำกัดจำนวนไบต์ ; ถูกไล่ออกจากหน่วยความจำแล้วจะพักลงดิสก์ (จำกัดขนาดเช่นกัน)
+# - หลายคนขอ id เดียวกันพร้อมกัน -> โหลดจริงครั้งเดียว ที่เหลือรอผลเดียวกัน
+# - โหลดไม่สำเร็จ จำไว้ FAIL_TTL วินาที จะได้ไม่ยิง Drive ซ้ำๆ ตอนโดน throttle
+# - หน้าเว็บใช้ peek (ไม่รอโหลด) + warm (โหลดเบื้องหลังหลายรูปพร้อมกัน) ; PDF ใช้ get/load ที่รอผล
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SIZES = (480, 220)  # รูปรถ/หน้าค้นหา และรูปหน้าเจ้าของ (ตรงกับ pdf_card.CAR_PX / FACE_PX)
+MEM_LIMIT = 64 * 1024 * 1024
+DISK_LIMIT = 512 * 1024 * 1024
+DISK_DIR = os.path.join(tempfile.gettempdir(), "cbaregis_thumbs")
+FETCH_TIMEOUT = 8
+FAIL_TTL = 60
+WARM_WORKERS = 4
+DRIVE_ID = re.compile(r'/d/([a-zA-Z0-9_-]+)|id=([a-zA-Z0-9_-]+)')
+
+_session = requests.Session()
+
+
+def drive_file_id(url):
+    match = DRIVE_ID.search(str(url))
+    return (match.group(1) or match.group(2)) if match else None
+
+
+def fetch_drive_thumbnail(file_id):
+    res = _session.get(f"https://drive.google.com/thumbnail?id={file_id}&sz=w800", timeout=FETCH_TIMEOUT)
+    res.raise_for_status()
+    return res.content
+
+
+def resize_jpeg(data, max_px, quality=80):
+    from PIL import Image
+    img = Image.open(io.BytesIO(data)); img.thumbnail((max_px, max_px))
+    out = io.BytesIO(); img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+class ThumbCache:
+    def __init__(self, fetch=fetch_drive_thumbnail, mem_limit=MEM_LIMIT, disk_dir=DISK_DIR, disk_limit=DISK_LIMIT, sizes=SIZES):
+        self.fetch = fetch
+        self.mem_limit = mem_limit
+        self.disk_dir = disk_dir
+        self.disk_limit = disk_limit
+        self.sizes = tuple(sorted(sizes))
+        self.hits = self.disk_hits = self.misses = self.fetches = 0
+        self._mem = OrderedDict()  # (file id, ขนาด) -> bytes
+        self._mem_bytes = 0
+        self._disk_bytes = None
+        self._inflight = {}  # file id -> threading.Event
+        self._failed = {}    # file id -> เวลาที่โหลดไม่สำเร็จ
+        self._warming = set()  # (file id, ขนาด) ที่รอโหลดเบื้องหลัง
+        self._pool = None
+        self._lock = threading.Lock()
+        if disk_dir: os.makedirs(disk_dir, exist_ok=True)
+
+    def size_for(self, px):
+        # ขนาดที่เก็บไว้ที่เล็กที่สุดซึ่งไม่เล็กกว่า px
+        return next((s for s in self.sizes if s >= px), self.sizes[-1])
+
+    # --- หน่วยความจำ ---
+    def _mem_put(self, key, data):
+        with self._lock:
+            if key in self._mem: return
+            self._mem[key] = data; self._mem_bytes += len(data)
+            spill = []
+            while self._mem_bytes > self.mem_limit and len(self._mem) > 1:
+                k, d = self._mem.popitem(last=False); self._mem_bytes -= len(d); spill.append((k, d))
+        for k, d in spill: self._disk_put(k, d)
+
+    # --- ดิสก์ ---
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key[0]}_{key[1]}.jpg")
+
+    def _disk_get(self, key):
+        if not self.disk_dir: return None
+        try:
+            with open(self._path(key), "rb") as f: return f.read()
+        except OSError: return None
+
+    def _disk_put(self, key, data):
+        if not self.disk_dir: return
+        path = self._path(key)
+        if os.path.exists(path): return
+        try:
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+        except OSError: return
+        with self._lock:
+            if self._disk_bytes is None: self._disk_bytes = self._scan_disk()[1]
+            else: self._disk_bytes += len(data)
+            over = self._disk_bytes > self.disk_limit
+        if over: self._trim_disk()
+
+    def _scan_disk(self):
+        files = [e for e in os.scandir(self.disk_dir) if e.is_file() and e.name.endswith(".jpg")]
+        return files, sum(e.stat().st_size for e in files)
+
+    def _trim_disk(self):
+        # ลบไฟล์เก่าสุดจนเหลือ ~80% ของเพดาน
+        files, total = self._scan_disk()
+        for e in sorted(files, key=lambda e: e.stat().st_mtime):
+            if total <= self.disk_limit * 0.8: break
+            try: size = e.stat().st_size; os.remove(e.path); total -= size
+            except OSError: pass
+        with self._lock: self._disk_bytes = self._scan_disk()[1]
+
+    # --- โหลด ---
+    def _load(self, file_id):
+        self.fetches += 1
+        try: raw = self.fetch(file_id)
+        except Exception:
+            with self._lock: self._failed[file_id] = time.time()
+            return
+        for s in self.sizes:
+            try: self._mem_put((file_id, s), resize_jpeg(raw, s))
+            except Exception:
+                with self._lock: self._failed[file_id] = time.time()
+                return
+
+    def peek(self, file_id, px=SIZES[0]):
+        # เฉพาะที่มีอยู่แล้ว (หน่วยความจำ/ดิสก์) ไม่โหลดจาก Drive ; None = ยังไม่มี
+        key = (file_id, self.size_for(px))
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key); self.hits += 1; return data
+        data = self._disk_get(key)
+        if data is not None:
+            self.disk_hits += 1; self._mem_put(key, data)
+        return data
+
+    def warm(self, file_ids, px=SIZES[0]):
+        # โหลดเบื้องหลังพร้อมกันสูงสุด WARM_WORKERS รูป (ไม่รอผล) ; id ที่รอคิวอยู่แล้วไม่ส่งซ้ำ
+        keys = [(f, self.size_for(px)) for f in file_ids if f]
+        with self._lock:
+            keys = [k for k in dict.fromkeys(keys) if k not in self._warming and k not in self._mem]
+            if not keys: return
+            self._warming.update(keys)
+            if self._pool is None: self._pool = ThreadPoolExecutor(WARM_WORKERS, thread_name_prefix="thumb-warm")
+        for k in keys: self._pool.submit(self._warm_one, k)
+
+    def _warm_one(self, key):
+        try: self.get(*key)
+        finally:
+            with self._lock: self._warming.discard(key)
+
+    def get(self, file_id, px=SIZES[0]):
+        # bytes ของรูปขนาดไม่เกิน size_for(px) หรือ None ถ้าโหลดไม่ได้ (รอโหลดจาก Drive ถ้ายังไม่มี)
+        key = (file_id, self.size_for(px))
+        data = self.peek(file_id, px)
+        if data is not None: return data
+        with self._lock:
+            self.misses += 1
+            if time.time() - self._failed.get(file_id, 0) < FAIL_TTL: return None
+            ev = self._inflight.get(file_id); owner = ev is None
+            if owner: ev = self._inflight[file_id] = threading.Event()
+        if owner:
+            try: self._load(file_id)
+            finally:
+                with self._lock: del self._inflight[file_id]
+                ev.set()
+        else: ev.wait(FETCH_TIMEOUT * 2)
+        with self._lock: data = self._mem.get(key)
+        return data if data is not None else self._disk_get(key)
+
+    def load(self, url, px=SIZES[0]):
+        # ใช้เป็น loader ของ pdf_card: None = ไม่มีลิงก์ ; b"" = โหลดไม่ได้
+        if not url: return None
+        file_id = drive_file_id(url)
+        return (self.get(file_id, px) if file_id else None) or b""
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._mem), "mem_bytes": self._mem_bytes, "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses, "fetches": self.fetches}
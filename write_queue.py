@@ -0,0 +1,216 @@
+# ✅ คิวเขียนแบบ write-behind (แทน sheet.find + sheet.update ทีละครั้ง)
+# - การแก้ไขมีผลกับ roster ทันที (optimistic) แล้วค่อยเขียนลงชีตรวดเดียวด้วย batch_update
+#   ทุก FLUSH_SEC วินาที หรือเมื่อค้างครบ FLUSH_OPS รายการ
+# - ช่องเดียวกันถูกแก้หลายครั้งก่อน flush -> ส่งเฉพาะค่าล่าสุด
+# - หัก/เพิ่มแต้มเก็บเป็นรายการ (แต้ม, เจ้าหน้าที่, เหตุผล) ตอน flush จะอ่านคอลัมน์ N ล่าสุดจากชีต (batch_get ครั้งเดียว)
+#   แล้วค่อยบวกต่อ ประวัติไปต่อท้ายชีต score_events (append_rows) เจ้าหน้าที่ 2 คนหักแต้มคนเดียวกันพร้อมกันจึงไม่ทับกัน
+# - batch_update ที่ล้ม (เช่น timeout หลังชีตบันทึกไปแล้ว) ส่งซ้ำด้วยค่าเดิมแบบค่าสุดท้าย ไม่บวกแต้มซ้ำ
+# - ก่อนเขียนอ่านรหัส (คอลัมน์ C) ของแถวนั้นมาเทียบ: แถวเลื่อน (มีคนลบ/แทรกแถวในชีต) -> หาแถวใหม่จากรหัส
+#   หาไม่ได้แน่ชัด (ไม่พบ / รหัสซ้ำ) -> ไม่เขียน เก็บไว้ใน conflicts ให้เจ้าหน้าที่ตรวจสอบ
+import atexit
+import threading
+import time
+
+from gspread.utils import rowcol_to_a1
+
+from roster import COL_ID, norm_id
+from score_events import make_event, now_ts
+
+FLUSH_SEC = 5.0
+FLUSH_OPS = 20
+COL_SCORE = 13  # N
+
+
+def score_of(val):
+    return int(val) if str(val).isdigit() else 100
+
+
+def apply_score(score, ops):
+    # ops = [(รหัส, แต้ม, เจ้าหน้าที่, เหตุผล, เวลา)] ; จำกัดแต้ม 0-100 ทีละรายการเหมือนเดิม
+    # คืน (แต้มใหม่, event ที่มี delta จริงหลังจำกัดแล้ว)
+    events = []
+    for sid, points, officer, reason, ts in ops:
+        new = max(0, min(100, score + points))
+        events.append(make_event(sid, new - score, points, officer, reason, ts)); score = new
+    return score, events
+
+
+class WriteQueue:
+    def __init__(self, sheet, roster, events, flush_sec=FLUSH_SEC, flush_ops=FLUSH_OPS):
+        self.sheet = sheet
+        self.roster = roster
+        self.events = events
+        self.flush_sec = flush_sec
+        self.flush_ops = flush_ops
+        self.last_error = None
+        self.flushed_at = 0.0
+        self._cells = {}   # (row, col) -> ค่า
+        self._scores = {}  # row -> [(รหัส, แต้ม, เจ้าหน้าที่, เหตุผล, เวลา)]
+        self._events = []  # event ที่แต้มลงชีตแล้ว แต่ยัง append ไม่สำเร็จ
+        self._events_unsure = False  # append ครั้งก่อนล้ม (อาจลงชีตไปแล้ว) -> รอบหน้าเช็ก id ก่อนส่ง
+        self._sids = {}    # row -> รหัสที่ควรอยู่ในแถวนั้นของชีต (ก่อนแก้)
+        self._inflight = None  # (data, แต้มใหม่, events, cells) ที่ batch_update ล้ม อาจลงชีตไปแล้ว -> ส่งค่าเดิมซ้ำ
+        self._moved = {}   # row เดิม -> (รหัส, {col: ค่า}, ops) ของแถวที่รหัสในชีตไม่ตรง
+        self.conflicts = []  # [(รหัส, row เดิม, {col: ค่า}, ops)] ที่หาแถวใหม่ไม่ได้แน่ชัด (ไม่ได้เขียนลงชีต)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        roster.before_refresh = self.try_flush
+        threading.Thread(target=self._run, daemon=True, name="sheet-write-queue").start()
+        atexit.register(self.try_flush)
+
+    def pending(self):
+        with self._lock:
+            n = len(self._cells) + sum(len(v) for v in self._scores.values()) + len(self._events)
+            n += sum(len(c) + len(o) for _, c, o in self._moved.values()) + sum(len(c) + len(o) for _, _, c, o in self.conflicts)
+            if self._inflight: n += len(self._inflight[0])
+            return n
+
+    def _queued(self):
+        if self.pending() >= self.flush_ops: self._wake.set()
+
+    # --- เพิ่มงาน ---
+    def _expect(self, row, r):
+        # จำรหัสเดิมของแถวไว้ก่อน patch (การแก้ไขอาจเปลี่ยนรหัสเอง)
+        with self._lock: self._sids.setdefault(row, norm_id(r[COL_ID]))
+
+    def set_cells(self, row, start_col, values):
+        with self.roster.lock:
+            r = self.roster.get_row(row, refresh=False)
+            if r is None: raise KeyError(f"row {row} not in roster")
+            self._expect(row, r)
+            self.roster.patch(row, start_col, values)
+        with self._lock:
+            for k, val in enumerate(values): self._cells[(row, start_col + k)] = str(val)
+        self._queued()
+
+    def adjust_score(self, row, points, officer, reason):
+        # points ติดลบ = หัก ; คืนแต้มใหม่ตามข้อมูลใน roster ที่รวมรายการที่ยังไม่ flush แล้ว
+        self.roster.refresh()
+        with self.roster.lock:
+            r = self.roster.get_row(row, refresh=False)
+            if r is None: raise KeyError(f"row {row} not in roster")
+            op = (r[COL_ID], points, officer, reason, now_ts())
+            score, _ = apply_score(score_of(r[COL_SCORE]), [op])
+            self._expect(row, r)
+            self.roster.patch(row, COL_SCORE, [str(score)])
+            with self._lock: self._scores.setdefault(row, []).append(op)
+        self._queued()
+        return score
+
+    # --- เขียนลงชีต ---
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_sec); self._wake.clear()
+            self.try_flush()
+
+    def try_flush(self):
+        # flush แบบไม่โยน error (งานที่ล้มยังอยู่ในคิว ดูสาเหตุได้ที่ last_error)
+        try: return self.flush()
+        except Exception: return 0
+
+    def drop_conflicts(self):
+        # เจ้าหน้าที่รับทราบแล้ว (แก้ในชีตเอง) -> ล้างรายการที่บันทึกไม่ได้
+        with self._lock: out, self.conflicts = self.conflicts, []
+        return out
+
+    def _requeue(self, cells, scores, sids):
+        # คืนงานกลับเข้าคิว (ค่าที่ถูกแก้ซ้ำระหว่างนี้ใช้ค่าใหม่กว่า ; รหัสที่จำไว้ใช้ของเก่ากว่า)
+        with self._lock:
+            for k, val in cells.items(): self._cells.setdefault(k, val)
+            for r, ops in scores.items(): self._scores[r] = ops + self._scores.get(r, [])
+            self._sids.update(sids)
+
+    def _relocate(self):
+        # แถวที่รหัสในชีตไม่ตรง: โหลดชีตใหม่แล้วหาแถวจากรหัส (ต้องไม่ถือ _flush_lock เพราะ refresh จะ flush ก่อน)
+        with self._lock: moved, self._moved = self._moved, {}
+        try: self.roster.refresh(force=True)
+        except Exception:
+            with self._lock: self._moved = {**moved, **self._moved}
+            raise
+        lost = []
+        for old, (sid, cells, ops) in moved.items():
+            rows = self.roster.rows_of_id(sid)
+            if len(rows) != 1: lost.append((sid, old, cells, ops)); continue
+            row = rows[0]
+            with self.roster.lock:
+                for c, val in cells.items(): self.roster.patch(row, c, [val])
+                with self._lock:
+                    for c, val in cells.items(): self._cells.setdefault((row, c), val)
+                    self._scores[row] = ops + self._scores.get(row, [])
+                    self._sids.setdefault(row, sid)
+                    pend = list(self._scores[row])
+                if ops:
+                    r = self.roster.get_row(row, refresh=False)
+                    self.roster.patch(row, COL_SCORE, [str(apply_score(score_of(r[COL_SCORE]), pend)[0])])
+        if lost:
+            with self._lock: self.conflicts += lost
+            self.last_error = RuntimeError("หาแถวในชีตไม่ได้แน่ชัด: รหัส " + ", ".join(x[0] for x in lost))
+
+    def _send_inflight(self):
+        data, merged, events, cells = self._inflight
+        try: self.sheet.batch_update(data)
+        except Exception as e:
+            self.last_error = e
+            raise
+        self._inflight = None
+        with self._lock: self._events += events
+        # ชีตอาจมีรายการจากเครื่องอื่นที่ roster ยังไม่เห็น -> ใช้ค่าที่รวมแล้วจากชีต (+ รายการที่เข้าคิวระหว่างนี้)
+        with self.roster.lock:
+            for r, score in merged.items():
+                with self._lock: extra = list(self._scores.get(r, []))
+                score, _ = apply_score(score, extra)
+                self.roster.patch(r, COL_SCORE, [str(score)])
+            for (r, c), val in cells.items():
+                with self._lock: newer = (r, c) in self._cells
+                if not newer: self.roster.patch(r, c, [val])
+
+    def flush(self):
+        if self._moved: self._relocate()
+        with self._flush_lock:
+            n = 0
+            if self._inflight: n += len(self._inflight[0]); self._send_inflight()
+            with self._lock:
+                cells, scores, sids = self._cells, self._scores, self._sids
+                self._cells, self._scores, self._sids = {}, {}, {}
+            n += len(cells) + sum(len(v) for v in scores.values())
+            if cells or scores:
+                try:
+                    rows = sorted(set(scores) | {r for r, _ in cells})
+                    got = self.sheet.batch_get([f"C{r}" for r in rows] + [f"N{r}" for r in rows if r in scores])
+                    cur = dict(zip(rows, got))
+                    moved = {}
+                    for r in rows:
+                        vals = cur[r]
+                        if norm_id(vals[0][0] if vals and vals[0] else "") != sids.get(r):
+                            moved[r] = (sids.get(r), {c: val for (rr, c), val in cells.items() if rr == r}, scores.get(r, []))
+                    data, merged, events = [], {}, []
+                    for r, vals in zip([r for r in rows if r in scores], got[len(rows):]):
+                        if r in moved: continue
+                        sc = vals[0][0] if vals and vals[0] else ""
+                        merged[r], ev = apply_score(score_of(sc), scores[r]); events += ev
+                        data.append({"range": f"N{r}", "values": [[str(merged[r])]]})
+                    sent = {k: val for k, val in cells.items() if k[0] not in moved}
+                    data += [{"range": rowcol_to_a1(r, c + 1), "values": [[val]]} for (r, c), val in sent.items()]
+                except Exception as e:
+                    self._requeue(cells, scores, sids)
+                    self.last_error = e
+                    raise
+                if moved:
+                    with self._lock: self._moved.update(moved)
+                    self._wake.set()
+                # ตั้งแต่ตรงนี้ค่าเป็นค่าสุดท้ายแล้ว: ล้มก็ส่งชุดเดิมซ้ำ (ไม่อ่าน N มาบวกใหม่)
+                if data:
+                    self._inflight = (data, merged, events, sent)
+                    self._send_inflight()
+            # แต้มลงชีตแล้ว -> ต่อท้ายประวัติ (ถ้าล้มจะลองใหม่รอบหน้า โดยไม่เขียนแต้มซ้ำ)
+            with self._lock: events, self._events = self._events, []
+            try: self.events.append(events, check=self._events_unsure)
+            except Exception as e:
+                with self._lock: self._events = events + self._events
+                self._events_unsure = True
+                self.last_error = e
+                raise
+            self._events_unsure = False
+            self.last_error, self.flushed_at = None, time.time()
+            return n